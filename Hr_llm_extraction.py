@@ -1,14 +1,31 @@
 import json
 import re
 import os
-from groq import Groq
+import time
+import asyncio
+import argparse
+import threading
+from collections import deque
+from groq import Groq, AsyncGroq
 from dotenv import load_dotenv
+from pipeline_io import RecordWriter, iter_records
+import llm_cache
+from skill_gazetteer import coverage, is_confident, load_matcher
+from llm_throttle import COMPLETION_TOKEN_ESTIMATE, RateLimiter, call_with_retries, estimate_tokens
 
 load_dotenv()
 
 INPUT_FILE = "step2_sections.json"
 OUTPUT_FILE = "step3_llm_output.json"
 LLM_MODEL_NAME = "llama-3.3-70b-versatile"
+REQUESTS_PER_MINUTE = int(os.getenv("GROQ_RPM", "30"))
+TOKENS_PER_MINUTE = int(os.getenv("GROQ_TPM", "6000"))
+MAX_RETRIES = 5
+CACHE_BYPASS = False
+CHECKPOINT_EVERY = 10
+BATCH_TOKEN_BUDGET = 4000
+
+stats = {"requests": 0, "fallbacks": 0, "local": 0}
 
 api_key = os.getenv("GROQ_API")
 if not api_key:
@@ -31,6 +48,22 @@ Return ONLY a JSON array of skills (NO markdown, NO code blocks):
 Resume text:
 """
 
+BATCH_PROMPT = """
+Extract professional and technical skills from EACH of the resumes below.
+
+Rules:
+- Extract ONLY technical skills, tools, programming languages, frameworks, certifications
+- Return short phrases (2-5 words maximum)
+- NO full sentences
+- NO soft skills like "communication" or "teamwork"
+- Include EVERY resume id exactly as written, even if it has no skills
+
+Return ONLY a JSON object mapping resume id to its array of skills (NO markdown, NO code blocks):
+{"<resume id>": ["skill1", "skill2"], "<resume id>": []}
+
+Resumes:
+"""
+
 SKILLS_HEADERS = [
     "skills", "technical skills", "competencies", "expertise",
     "tools", "technologies", "projects", "certifications"
@@ -52,77 +85,523 @@ def clean_llm_json(content):
     return content.strip()
 
 
-def run():
-    with open(INPUT_FILE, encoding="utf-8") as f:
-        data = json.load(f)
+def build_llm_input(r):
+    skills_text = combine_skill_sections(r)
+    if not skills_text:
+        skills_text = r.get("raw_text", "")[:2000]
 
-    results = []
+    experience_section = r.get("experience_section", "")
+    return f"{skills_text}\n\n{experience_section}"
 
-    for r in data:
-        resume_id = r.get("resume_id", "")
-        filename = r.get("filename", "")
 
-        file_path = r.get("file_path") or r.get("File_path") or ""
+def build_request(r):
+    return {
+        "model": LLM_MODEL_NAME,
+        "messages": [{"role": "user", "content": PROMPT + build_llm_input(r)}],
+        "temperature": 0
+    }
 
-        name = r.get("name", "Unknown")
-        email = r.get("email", "")
 
-        print("-----")
-        print("Processing:", filename)
-        print("DEBUG File_path from Step2:", r.get("File_path"))
-        print("DEBUG file_path from Step2:", r.get("file_path"))
-        print("FINAL file_path USED:", file_path)
+def parse_skills(content):
+    content = clean_llm_json(content.strip())
+    skills_list = json.loads(content)
 
-        skills_text = combine_skill_sections(r)
-        if not skills_text:
-            skills_text = r.get("raw_text", "")[:2000]
+    if not isinstance(skills_list, list):
+        skills_list = []
+    return skills_list
 
-        experience_section = r.get("experience_section", "")
-        llm_input = f"{skills_text}\n\n{experience_section}"
 
-        try:
-            response = client.chat.completions.create(
-                model=LLM_MODEL_NAME,
-                messages=[{"role": "user", "content": PROMPT + llm_input}],
-                temperature=0
-            )
-
-            content = response.choices[0].message.content.strip()
-            content = clean_llm_json(content)
-            skills_list = json.loads(content)
-
-            if not isinstance(skills_list, list):
-                skills_list = []
-
-        except Exception as e:
-            print("ERROR extracting skills:", e)
-            skills_list = []
-
-        final_result = {
-            "resume_id": resume_id,
-            "filename": filename,
-            "file_path": file_path,
-            "name": name,
-            "email": email,
-            "skills": skills_list,
-            "experience_years": r.get("experience_years", 0.0),
-            "internship_years": r.get("internship_years", 0.0),
-            "total_experience_years": r.get("total_experience_years", 0.0)
-        }
+def build_result(r, skills_list):
+    final_result = {
+        "resume_id": r.get("resume_id", ""),
+        "filename": r.get("filename", ""),
+        "file_path": r.get("file_path") or r.get("File_path") or "",
+        "name": r.get("name", "Unknown"),
+        "email": r.get("email", ""),
+        "skills": skills_list,
+        "experience_years": r.get("experience_years", 0.0),
+        "internship_years": r.get("internship_years", 0.0),
+        "total_experience_years": r.get("total_experience_years", 0.0)
+    }
 
-        results.append(final_result)
+    print("Skills Extracted:", len(skills_list))
+    print("Experience:", final_result["total_experience_years"], "years")
 
-        print("Skills Extracted:", len(skills_list))
-        print("Experience:", final_result["total_experience_years"], "years")
+    return final_result
 
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-        json.dump(results, f, indent=2, ensure_ascii=False)
 
-    print("\n Complete! Saved to", OUTPUT_FILE)
-    print("Total resumes processed:", len(results))
+def complete(request):
+    content = llm_cache.lookup(request, CACHE_BYPASS)
+    if content is None:
+        stats["requests"] += 1
+        response = client.chat.completions.create(**request)
+        content = response.choices[0].message.content
+        llm_cache.store(request, content)
+    return content
 
 
-if __name__ == "__main__":
-    run()
+def extract_skills(r):
+    request = build_request(r)
+
+    try:
+        content = complete(request)
+        return parse_skills(content)
+    except Exception:
+        # never keep an unparseable answer, or a retry would replay it
+        llm_cache.invalidate(request)
+        raise
+
 
+async def extract_skills_async(r, async_client, limiter, semaphore):
+    request = build_request(r)
+    prompt = request["messages"][0]["content"]
 
+    async def make_call():
+        return await async_client.chat.completions.create(**request)
+
+    content = llm_cache.lookup(request, CACHE_BYPASS)
+
+    try:
+        if content is None:
+            stats["requests"] += 1
+            async with semaphore:
+                response = await call_with_retries(
+                    make_call, limiter, estimate_tokens(prompt), MAX_RETRIES
+                )
+            content = response.choices[0].message.content
+            llm_cache.store(request, content)
+
+        return parse_skills(content)
+    except Exception:
+        llm_cache.invalidate(request)
+        raise
+
+
+def pack_batches(records, batch_size, token_budget):
+    batch = []
+    batch_tokens = estimate_tokens(BATCH_PROMPT, 0)
+
+    for r in records:
+        tokens = estimate_tokens(build_llm_input(r))
+        if batch and (len(batch) >= batch_size or batch_tokens + tokens > token_budget):
+            yield batch
+            batch = []
+            batch_tokens = estimate_tokens(BATCH_PROMPT, 0)
+        batch.append(r)
+        batch_tokens += tokens
+
+    if batch:
+        yield batch
+
+
+def build_batch_request(batch):
+    sections = "\n".join(
+        f"### RESUME ID: {r.get('resume_id', '')}\n{build_llm_input(r)}\n" for r in batch
+    )
+    return {
+        "model": LLM_MODEL_NAME,
+        "messages": [{"role": "user", "content": BATCH_PROMPT + sections}],
+        "temperature": 0
+    }
+
+
+def parse_batch_skills(content, batch):
+    answer = json.loads(clean_llm_json(content.strip()))
+    if not isinstance(answer, dict):
+        raise ValueError("batched answer is not a JSON object")
+
+    expected = {r.get("resume_id", "") for r in batch}
+    unexpected = set(answer) - expected
+    if unexpected:
+        print("WARNING: batched answer has unknown ids:", sorted(unexpected)[:5])
+
+    return {rid: skills for rid, skills in answer.items()
+            if rid in expected and isinstance(skills, list)}
+
+
+def extract_batch(batch):
+    request = build_batch_request(batch)
+
+    try:
+        content = complete(request)
+        answered = parse_batch_skills(content, batch)
+    except Exception as e:
+        print("ERROR in batched extraction, falling back to single calls:", e)
+        llm_cache.invalidate(request)
+        answered = {}
+
+    entries = []
+    for r in batch:
+        resume_id = r.get("resume_id", "")
+        if resume_id in answered:
+            entries.append(ok_entry(r, answered[resume_id]))
+        else:
+            stats["fallbacks"] += 1
+            entries.append(extract_record(r))
+    return entries
+
+
+async def extract_batch_async(batch, async_client, limiter, semaphore):
+    request = build_batch_request(batch)
+    prompt = request["messages"][0]["content"]
+
+    async def make_call():
+        return await async_client.chat.completions.create(**request)
+
+    content = llm_cache.lookup(request, CACHE_BYPASS)
+
+    try:
+        if content is None:
+            stats["requests"] += 1
+            async with semaphore:
+                response = await call_with_retries(
+                    make_call, limiter,
+                    estimate_tokens(prompt, COMPLETION_TOKEN_ESTIMATE * len(batch)),
+                    MAX_RETRIES
+                )
+            content = response.choices[0].message.content
+            llm_cache.store(request, content)
+        answered = parse_batch_skills(content, batch)
+    except Exception as e:
+        print("ERROR in batched extraction, falling back to single calls:", e)
+        llm_cache.invalidate(request)
+        answered = {}
+
+    missing = [r for r in batch if r.get("resume_id", "") not in answered]
+    stats["fallbacks"] += len(missing)
+    fallback = await asyncio.gather(*(
+        extract_record_async(r, async_client, limiter, semaphore) for r in missing
+    ))
+    fallback = {entry["resume_id"]: entry for entry in fallback}
+
+    print("-----")
+    print(f"Processed batch of {len(batch)} ({len(missing)} single-call fallbacks)")
+    return [ok_entry(r, answered[r.get("resume_id", "")])
+            if r.get("resume_id", "") in answered else fallback[r.get("resume_id", "")]
+            for r in batch]
+
+
+def local_skills(r):
+    if "gazetteer_skills" in r:
+        skills, ratio = r["gazetteer_skills"], r.get("gazetteer_coverage", 0.0)
+    else:
+        matcher = load_matcher()
+        if matcher is None:
+            return None
+        skills = matcher.match(build_llm_input(r))
+        ratio = coverage(r.get("skills", ""), matcher)
+
+    return skills if is_confident(skills, ratio) else None
+
+
+def route_local(records, on_entry):
+    # Resumes the gazetteer covers well are answered here; only the rest reach the LLM
+    for r in records:
+        skills = local_skills(r)
+        if skills is None:
+            yield r
+            continue
+        stats["local"] += 1
+        print("Gazetteer answered:", r.get("filename", ""))
+        on_entry(ok_entry(r, skills))
+
+
+def ok_entry(r, skills_list):
+    return {"resume_id": r.get("resume_id", ""), "status": "ok",
+            "result": build_result(r, skills_list)}
+
+
+def failed_entry(r, error):
+    print("ERROR extracting skills:", r.get("filename", ""), error)
+    return {"resume_id": r.get("resume_id", ""), "status": "failed", "error": str(error)}
+
+
+def extract_record(r):
+    print("-----")
+    print("Processing:", r.get("filename", ""))
+    print("DEBUG File_path from Step2:", r.get("File_path"))
+    print("DEBUG file_path from Step2:", r.get("file_path"))
+    print("FINAL file_path USED:", r.get("file_path") or r.get("File_path") or "")
+
+    try:
+        return ok_entry(r, extract_skills(r))
+    except Exception as e:
+        return failed_entry(r, e)
+
+
+async def extract_record_async(r, async_client, limiter, semaphore):
+    try:
+        skills_list = await extract_skills_async(r, async_client, limiter, semaphore)
+    except Exception as e:
+        return failed_entry(r, e)
+
+    print("-----")
+    print("Processed:", r.get("filename", ""))
+    return ok_entry(r, skills_list)
+
+
+async def extract_all_async(records, on_entry, concurrency, rpm, tpm,
+                            batch_size=1, batch_tokens=BATCH_TOKEN_BUDGET):
+    async_client = AsyncGroq(api_key=api_key, max_retries=0)
+    limiter = RateLimiter(rpm, tpm)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def extract_unit(unit):
+        if batch_size > 1:
+            return await extract_batch_async(unit, async_client, limiter, semaphore)
+        return [await extract_record_async(unit[0], async_client, limiter, semaphore)]
+
+    if batch_size > 1:
+        units = pack_batches(records, batch_size, batch_tokens)
+    else:
+        units = ([r] for r in records)
+
+    window = deque()
+
+    while True:
+        # the reader may block (--follow), so advance it off the event loop
+        unit = await asyncio.to_thread(next, units, None)
+        if unit is None:
+            break
+
+        window.append(asyncio.create_task(extract_unit(unit)))
+
+        while window and (len(window) >= concurrency * 2 or window[0].done()):
+            for entry in await window.popleft():
+                on_entry(entry)
+
+    while window:
+        for entry in await window.popleft():
+            on_entry(entry)
+
+
+def progress_path(output_file):
+    return output_file + ".progress.jsonl"
+
+
+def load_progress(path):
+    progress = {}
+    if not os.path.exists(path):
+        return progress
+
+    with open(path, "rb") as f:
+        data = f.read()
+
+    # A crash can leave a torn last line; cut the log back to the last full record
+    complete = data[:data.rfind(b"\n") + 1]
+    if len(complete) != len(data):
+        with open(path, "r+b") as f:
+            f.truncate(len(complete))
+
+    for line in complete.decode("utf-8").splitlines():
+        if line.strip():
+            entry = json.loads(line)
+            progress[entry["resume_id"]] = entry
+
+    return progress
+
+
+def needs_extraction(resume_id, progress, retry_failed):
+    entry = progress.get(resume_id)
+    if entry is None:
+        return not retry_failed
+    return entry["status"] != "ok"
+
+
+class InOrderOutput:
+    # Finished entries go to the output in input order: each one waits only for the
+    # resumes read before it, so the output grows while extraction runs and a --follow
+    # reader downstream sees records as soon as the head of the input is done
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.order = deque()
+        self.finished = {}
+        self.missing = []
+        self.not_attempted = []
+        self.lock = threading.Lock()
+
+    def expect(self, resume_id):
+        with self.lock:
+            self.order.append(resume_id)
+
+    def finish(self, entry):
+        with self.lock:
+            self.finished[entry["resume_id"]] = entry
+            while self.order and self.order[0] in self.finished:
+                entry = self.finished.pop(self.order.popleft())
+                if entry["status"] == "ok":
+                    self.writer.write(entry["result"])
+                elif entry["status"] == "not_attempted":
+                    self.not_attempted.append(entry["resume_id"])
+                else:
+                    self.missing.append(entry["resume_id"])
+
+
+def run(input_file=INPUT_FILE, output_file=OUTPUT_FILE, follow=False,
+        concurrency=1, rpm=REQUESTS_PER_MINUTE, tpm=TOKENS_PER_MINUTE,
+        resume=False, retry_failed=False, batch_size=1, batch_tokens=BATCH_TOKEN_BUDGET,
+        local_first=False):
+    log_file = progress_path(output_file)
+    resume = resume or retry_failed
+    progress = load_progress(log_file) if resume else {}
+
+    if resume:
+        done = sum(1 for e in progress.values() if e["status"] == "ok")
+        print(f"Resuming: {done} completed, {len(progress) - done} failed in {log_file}")
+
+    started = time.perf_counter()
+
+    log_lock = threading.Lock()
+
+    with RecordWriter(log_file, append=resume, atomic=False) as log, \
+            RecordWriter(output_file) as writer:
+        output = InOrderOutput(writer)
+
+        def pending(records):
+            # Every resume takes its place in the output order; ones the progress log
+            # already settles are passed straight through instead of extracted
+            for r in records:
+                resume_id = r.get("resume_id", "")
+                output.expect(resume_id)
+                if needs_extraction(resume_id, progress, retry_failed):
+                    yield r
+                else:
+                    # --retry-failed leaves resumes the log has never seen alone
+                    output.finish(progress.pop(resume_id, None)
+                                  or {"resume_id": resume_id, "status": "not_attempted"})
+
+        def on_entry(entry):
+            # async mode reports gazetteer hits from the reader thread
+            with log_lock:
+                log.write(entry)
+                if log.count % CHECKPOINT_EVERY == 0:
+                    log.checkpoint()
+            output.finish(entry)
+
+        data = pending(iter_records(input_file, follow=follow))
+        if local_first:
+            data = route_local(data, on_entry)
+
+        try:
+            if concurrency > 1:
+                asyncio.run(extract_all_async(data, on_entry, concurrency, rpm, tpm,
+                                              batch_size, batch_tokens))
+            elif batch_size > 1:
+                for batch in pack_batches(data, batch_size, batch_tokens):
+                    for entry in extract_batch(batch):
+                        on_entry(entry)
+            else:
+                for r in data:
+                    on_entry(extract_record(r))
+        except KeyboardInterrupt:
+            log.checkpoint()
+            writer.close(success=False)
+            print(f"\nInterrupted after {log.count} resumes; progress kept in {log_file}")
+            print("Rerun with --resume to continue.")
+            return
+
+    missing = output.missing
+
+    print("\n Complete! Saved to", output_file)
+    print("Total resumes processed:", log.count)
+    print("Total resumes written:", writer.count)
+    print(f"Elapsed: {time.perf_counter() - started:.1f}s")
+    print(f"LLM requests: {stats['requests']} ({stats['fallbacks']} single-call fallbacks, "
+          f"{stats['local']} answered by the gazetteer)")
+    print(llm_cache.summary())
+
+    if missing:
+        print(f"{len(missing)} resumes failed and are not in {output_file}:")
+        for resume_id in missing[:20]:
+            print("  ", resume_id)
+        print("Rerun with --retry-failed to extract only those.")
+
+    if output.not_attempted:
+        print(f"{len(output.not_attempted)} resumes were never attempted and are not in {output_file}:")
+        for resume_id in output.not_attempted[:20]:
+            print("  ", resume_id)
+        print("Rerun with --resume to extract them (and retry the failed ones).")
+
+
+def skill_set(skills):
+    return {str(s).strip().lower() for s in skills if str(s).strip()}
+
+
+def compare_batching(input_file=INPUT_FILE, sample=20, batch_size=8, batch_tokens=BATCH_TOKEN_BUDGET):
+    global CACHE_BYPASS
+    records = [r for _, r in zip(range(sample), iter_records(input_file))]
+    CACHE_BYPASS = True
+
+    report = {}
+    for label, size in (("single", 1), ("batched", batch_size)):
+        stats["requests"] = stats["fallbacks"] = 0
+        started = time.perf_counter()
+        if size > 1:
+            entries = [e for batch in pack_batches(records, size, batch_tokens)
+                       for e in extract_batch(batch)]
+        else:
+            entries = [extract_record(r) for r in records]
+        report[label] = {
+            "seconds": time.perf_counter() - started,
+            "requests": stats["requests"],
+            "fallbacks": stats["fallbacks"],
+            "skills": {e["resume_id"]: skill_set(e["result"]["skills"])
+                       for e in entries if e["status"] == "ok"}
+        }
+
+    single, batched = report["single"]["skills"], report["batched"]["skills"]
+    common = [rid for rid in single if rid in batched]
+    jaccard = [len(single[rid] & batched[rid]) / max(len(single[rid] | batched[rid]), 1)
+               for rid in common]
+
+    print("\n===== BATCHED vs SINGLE EXTRACTION =====")
+    print(f"Resumes compared      : {len(records)} (batch size {batch_size}, "
+          f"token budget {batch_tokens})")
+    for label in ("single", "batched"):
+        print(f"{label:<8} requests      : {report[label]['requests']} "
+              f"({report[label]['fallbacks']} fallbacks), "
+              f"wall time {report[label]['seconds']:.1f}s")
+    if jaccard:
+        print(f"Mean skill Jaccard    : {sum(jaccard) / len(jaccard):.3f}")
+        print(f"Identical skill sets  : {sum(1 for j in jaccard if j == 1.0)}/{len(common)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", default=INPUT_FILE, help="step2 output (.json or .jsonl)")
+    parser.add_argument("--output", default=OUTPUT_FILE, help="step3 output (.json or .jsonl)")
+    parser.add_argument("--follow", action="store_true",
+                        help="keep reading a .jsonl input until the upstream stage finishes")
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="in-flight LLM requests; above 1 switches to the asyncio client")
+    parser.add_argument("--rpm", type=int, default=REQUESTS_PER_MINUTE,
+                        help="requests-per-minute budget (async mode)")
+    parser.add_argument("--tpm", type=int, default=TOKENS_PER_MINUTE,
+                        help="tokens-per-minute budget (async mode)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="skip cached LLM answers (fresh answers are still stored)")
+    parser.add_argument("--resume", action="store_true",
+                        help="skip resume_ids already completed in the progress log")
+    parser.add_argument("--retry-failed", action="store_true",
+                        help="only re-extract resumes the progress log marks as failed")
+    parser.add_argument("--batch-size", type=int, default=1,
+                        help="resumes packed into one request (1 = one request per resume)")
+    parser.add_argument("--batch-tokens", type=int, default=BATCH_TOKEN_BUDGET,
+                        help="estimated prompt-token budget per batched request")
+    parser.add_argument("--compare", type=int, metavar="N", default=0,
+                        help="report requests, wall time and agreement of batched vs single "
+                             "extraction on the first N resumes (bypasses the cache)")
+    parser.add_argument("--local-first", action="store_true",
+                        help="use the skill gazetteer and only call the LLM when its coverage is low")
+    args = parser.parse_args()
+
+    CACHE_BYPASS = args.no_cache
+    if args.compare:
+        compare_batching(args.input, args.compare, max(args.batch_size, 2), args.batch_tokens)
+    else:
+        run(args.input, args.output, follow=args.follow,
+            concurrency=args.concurrency, rpm=args.rpm, tpm=args.tpm,
+            resume=args.resume, retry_failed=args.retry_failed,
+            batch_size=args.batch_size, batch_tokens=args.batch_tokens,
+            local_first=args.local_first)
@@ -1,45 +1,84 @@
 import os
 import re
-import json
-import faiss
-import torch
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import pdfplumber
 from tkinter import Tk, filedialog
-from transformers import AutoTokenizer, AutoModel
+from text_cache import cached_extract
+import embedding_service
+from embedding_service import encode_one
+from skill_gazetteer import load_matcher
+import faiss_index
+from faiss_index import grouped_search, GROUP_COMBINE
+from metadata_store import open_store
+from search_filters import VectorFilter, filtered_params
+from skill_index import open_skill_index
+from bm25_index import load_bm25, fuse_rrf, RESUME_BM25_DIR, RRF_DEPTH
+from Hr_resume_status import load_status
 
-HF_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
 TOP_K = 20
 FAISS_INDEX_FILE = "resume_faiss.index"
 METADATA_FILE = "resume_metadata.json"
-MAX_TOKENS = 256
+EXCLUDE_HIRED = True
+# Resumes taken from the filtered ANN search before skill scoring and BM25 fusion
+CANDIDATE_POOL = int(os.getenv("HR_CANDIDATE_POOL", "200"))
 
-index = faiss.read_index(FAISS_INDEX_FILE)
+index = None
+metadata_store = None
+vector_filter = None
+skill_idx = None
+_load_lock = threading.Lock()
 
-with open(METADATA_FILE, "r", encoding="utf-8") as f:
-    metadata_store = json.load(f)
 
-print(f" FAISS loaded: {index.ntotal} vectors")
-print(f" Metadata loaded: {len(metadata_store)} entries")
+def load_index():
+    global index, metadata_store, vector_filter, skill_idx
+    with _load_lock:
+        if index is None:
+            started = time.perf_counter()
+            metadata_store = open_store(FAISS_INDEX_FILE, METADATA_FILE, "resume_id")
+            vector_filter = VectorFilter(metadata_store)
+            skill_idx = open_skill_index(FAISS_INDEX_FILE, METADATA_FILE)
+            index = faiss_index.read_index(FAISS_INDEX_FILE)
 
+            print(f" FAISS loaded: {index.ntotal} vectors")
+            print(f" Metadata loaded: {len(metadata_store)} entries "
+                  f"({time.perf_counter() - started:.2f}s)")
+    return index, metadata_store
 
-device = "cuda" if torch.cuda.is_available() else "cpu"
-print(f" Using device: {device}")
 
-tokenizer = AutoTokenizer.from_pretrained(HF_MODEL_NAME)
-model = AutoModel.from_pretrained(HF_MODEL_NAME).to(device)
-model.eval()
+def _prewarm():
+    try:
+        load_index()
+    except Exception as e:
+        print(f" Prewarm failed, will retry on first search: {e}")
+
+
+def prewarm():
+    # Index, metadata and model load in the background while the user picks a file
+    embedding_service.prewarm()
+    thread = threading.Thread(target=_prewarm, daemon=True)
+    thread.start()
+    return thread
+
 
 def clean_text(text):
     return " ".join(text.split()).replace("\x00", "").lower()
 
 
-def extract_text_from_pdf(pdf_path):
+def read_pdf_text(pdf_path):
     text = ""
     with pdfplumber.open(pdf_path) as pdf:
         for page in pdf.pages:
             t = page.extract_text()
             if t:
                 text += t + "\n"
+    return text
+
+
+def extract_text_from_pdf(pdf_path):
+    text, _ = cached_extract(pdf_path, read_pdf_text)
     return clean_text(text)
 
 
@@ -49,6 +88,12 @@ def extract_experience_from_jd(text):
 
 
 def extract_skills_from_jd(text):
+    matcher = load_matcher()
+    if matcher:
+        skills = set(matcher.find(text))
+        if skills:
+            return skills
+
     stop_words = {
         "experience", "years", "knowledge", "required", "skills",
         "ability", "good", "strong", "hands", "working"
@@ -58,23 +103,7 @@ def extract_skills_from_jd(text):
 
 
 def embed_text(text):
-    encoded = tokenizer(
-        text,
-        truncation=True,
-        padding=True,
-        max_length=MAX_TOKENS,
-        return_tensors="pt"
-    ).to(device)
-
-    with torch.no_grad():
-        output = model(**encoded)
-        token_embeddings = output.last_hidden_state
-        mask = encoded["attention_mask"].unsqueeze(-1).float()
-
-        pooled = (token_embeddings * mask).sum(1) / mask.sum(1).clamp(min=1e-9)
-        pooled = torch.nn.functional.normalize(pooled, p=2, dim=1)
-
-    return pooled.cpu().numpy().astype("float32")
+    return encode_one(text)
 
 
 def upload_pdf(title):
@@ -91,68 +120,99 @@ def upload_pdf(title):
     return path
 
 
-def search_faiss(vector, top_k=TOP_K):
-    distances, indices = index.search(vector, top_k)
-
-    candidates = []
+def candidate_from_entry(entry, score):
+    meta = entry.get("metadata", {})
 
-    for idx, dist in zip(indices[0], distances[0]):
-        if idx >= len(metadata_store):
-            continue
-
-        entry = metadata_store[idx]
-        meta = entry.get("metadata", {})
-
-        candidates.append({
-            "semantic_score": float(dist),
-            "name": meta.get("name", "Unknown"),
-            "email": meta.get("email", "Unknown"),
-            "skills": meta.get("skills", []),
-            "experience_years": meta.get("experience_years", 0.0),
-            "internship_years": meta.get("internship_years", 0.0),
-            "total_experience_years": meta.get("total_experience_years", 0.0),
-            "filename": entry.get("filename", "Unknown"),
-            "file_path": entry.get("file_path", "Unknown")
-        })
-
-    return candidates
-
-
-def match_and_rank(candidates, jd_skills, jd_experience):
-    final_results = []
-
-    for c in candidates:
-        resume_exp = c["experience_years"]
+    return {
+        "semantic_score": float(score),
+        "name": meta.get("name", "Unknown"),
+        "email": meta.get("email", "Unknown"),
+        "skills": meta.get("skills", []),
+        "experience_years": meta.get("experience_years", 0.0),
+        "internship_years": meta.get("internship_years", 0.0),
+        "total_experience_years": meta.get("total_experience_years", 0.0),
+        "filename": entry.get("filename", "Unknown"),
+        "file_path": entry.get("file_path", "Unknown")
+    }
 
-        if jd_experience > 0 and resume_exp < jd_experience:
-            continue
 
-        resume_skills = [s.lower() for s in c["skills"]]
+def hired_filenames():
+    return {name for name, entry in load_status().items() if entry.get("status") == "hired"}
 
-        matched_skills = [
-            s for s in resume_skills
-            if any(jd in s for jd in jd_skills)
-        ]
 
-        if not matched_skills:
-            continue
+def skill_rows(vector_ids):
+    # group_ids for grouped_search: chunk -> skill index row of its resume
+    rows = skill_idx.chunk_resume
+    return {int(i): int(rows[i]) for i in vector_ids if 0 <= i < len(rows) and rows[i] >= 0}
 
-        skill_score = len(matched_skills) / max(len(resume_skills), 1)
 
-        final_score = (
-            0.7 * c["semantic_score"] +
-            0.3 * skill_score
+def semantic_pool(vector, n=CANDIDATE_POOL, min_experience=0.0, exclude_hired=EXCLUDE_HIRED,
+                  combine=GROUP_COMBINE):
+    # Best n resumes by semantic score, one per resume, as {skill index row: score}.
+    # Experience and hired status are applied inside the ANN search, so every one qualifies.
+    index, _ = load_index()
+    mask = vector_filter.mask(
+        min_experience=min_experience,
+        exclude_filenames=hired_filenames() if exclude_hired else None
+    )
+    groups = grouped_search(index, vector, n, skill_rows, combine,
+                            params=filtered_params(index, mask), available=int(mask.sum()))
+    return {row: score for row, score, _ in groups}
+
+
+def rank_candidates(vector, jd_skills, jd_experience, n=TOP_K, exclude_hired=EXCLUDE_HIRED,
+                    jd_text=None):
+    # Skill fit and the 0.7/0.3 blend re-rank a pool of CANDIDATE_POOL resumes from the
+    # filtered ANN search. With jd_text, a BM25 keyword search runs alongside and the two
+    # rankings are fused (RRF).
+    _, metadata_store = load_index()
+    bm25 = load_bm25(RESUME_BM25_DIR) if jd_text else None
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        keyword = pool.submit(bm25.search, jd_text, RRF_DEPTH) if bm25 else None
+
+        scores = semantic_pool(vector, max(CANDIDATE_POOL, n, RRF_DEPTH if keyword else 0),
+                               jd_experience, exclude_hired)
+        candidates = np.fromiter(scores, dtype="int64", count=len(scores))
+        semantic = np.zeros(len(skill_idx), dtype="float32")
+        semantic[candidates] = np.fromiter(scores.values(), dtype="float32", count=len(scores))
+
+        rows, final, matched = skill_idx.rank_rows(
+            semantic, jd_skills, candidates=candidates,
+            n=len(candidates) if keyword else n
         )
+        keyword_hits = keyword.result() if keyword else []
+
+    rrf_scores = {}
+    if keyword_hits:
+        # Only eligible resumes take part, so filters still hold after fusion
+        row_of = {str(skill_idx.resume_ids[row]): row for row in rows}
+        fused = fuse_rrf(
+            [str(skill_idx.resume_ids[row]) for row in rows[:RRF_DEPTH]],
+            [resume_id for resume_id, _ in keyword_hits if resume_id in row_of]
+        )
+        rows = [row_of[resume_id] for resume_id, _ in fused[:n]]
+        rrf_scores = dict(fused)
+    else:
+        # Ranked the whole pool for fusion but nothing matched the keywords
+        rows = rows[:n]
 
-        c["matched_skills"] = matched_skills
-        c["final_score"] = round(final_score, 4)
+    entries = metadata_store.get_many(skill_idx.first_chunk[row] for row in rows)
 
-        final_results.append(c)
+    results = []
+    for row in rows:
+        c = candidate_from_entry(entries[int(skill_idx.first_chunk[row])], semantic[row])
+        c["matched_skills"] = skill_idx.matched_skills(row, matched)
+        c["final_score"] = round(float(final[row]), 4)
+        if rrf_scores:
+            c["rrf_score"] = round(rrf_scores[str(skill_idx.resume_ids[row])], 5)
+        results.append(c)
 
-    return sorted(final_results, key=lambda x: x["final_score"], reverse=True)
+    return results
 
 
 def find_best_employees():
+    prewarm()
     print("\n Upload Job Description PDF")
     jd_path = upload_pdf("Select Job Description PDF")
 
@@ -172,10 +232,10 @@ def find_best_employees():
 
     jd_vector = embed_text(jd_text)
 
-    candidates = search_faiss(jd_vector)
-    print(f"✓ Found {len(candidates)} initial candidates")
+    candidates = rank_candidates(jd_vector, jd_skills, jd_experience, jd_text=jd_text)
+    print(f"✓ {len(candidates)} shortlisted from {len(skill_idx)} resumes")
 
-    return match_and_rank(candidates, jd_skills, jd_experience)
+    return candidates
 
 
 if __name__ == "__main__":
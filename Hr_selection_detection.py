@@ -1,6 +1,9 @@
-import json
 import re
+import time
+import argparse
 from datetime import datetime
+from pipeline_io import iter_records, write_records
+from skill_gazetteer import coverage, load_matcher
 
 INPUT_FILE = "steps1_raw_text.json"
 OUTPUT_FILE = "step2_sections.json"
@@ -23,6 +26,26 @@ LANGUAGES = {
     "french", "spanish", "german", "arabic", "urdu"
 }
 
+SECTION_KEYWORDS = {
+    "skills": SKILL_KEYWORDS,
+    "experience": EXP_KEYWORDS,
+    "projects": PROJECT_KEYWORDS,
+    "education": EDUCATION_KEYWORDS
+}
+
+# Every section header in one alternation; the named group tells which section matched.
+# The lookahead on first letters lets the engine reject most positions cheaply.
+SECTION_HEADER_PATTERN = re.compile(
+    r'(?i)\b(?=[' + ''.join(sorted({k[0].lower() for ks in SECTION_KEYWORDS.values() for k in ks})) +
+    r'])(?:' + '|'.join(
+        f'(?P<{name}>' + '|'.join(re.escape(k) for k in keywords) + ')'
+        for name, keywords in SECTION_KEYWORDS.items()
+    ) + r')\b'
+)
+
+EMAIL_PATTERN = re.compile(r'[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}')
+NAME_SCAN_CHARS = 400
+
 
 def extract_section_by_keywords(text, start_keywords, end_keywords=None):
     start_pattern = r'(?i)\b(' + '|'.join(re.escape(k) for k in start_keywords) + r')\b'
@@ -56,6 +79,10 @@ def extract_skills(text):
         [k for k in all_section_keywords if k not in SKILL_KEYWORDS]
     )
 
+    return split_skills(skills_text)
+
+
+def split_skills(skills_text):
     if not skills_text:
         return ""
 
@@ -160,9 +187,13 @@ def calculate_experience_years(text):
         "total_experience_years": round(total_months / 12, 1)
     }
 
-def extract_name(text, filename=""):
+def normalize_name_text(text):
     text = re.sub(r"[^\x00-\x7F]+", " ", text)
-    text = re.sub(r"\s+", " ", text).strip()
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def extract_name(text, filename=""):
+    text = normalize_name_text(text)
 
     email_match = re.search(
         r'[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}',
@@ -171,6 +202,10 @@ def extract_name(text, filename=""):
 
     search_area = text[:email_match.start()] if email_match else text[:100]
 
+    return name_from_search_area(search_area, filename)
+
+
+def name_from_search_area(search_area, filename=""):
     caps_match = re.match(
         r'^([A-Z]{2,}(?:\s+[A-Z]{2,}){1,3})\b',
         search_area
@@ -196,45 +231,168 @@ def extract_email(text):
     return match.group(0) if match else "Not found"
 
 
-def run():
-    with open(INPUT_FILE, "r", encoding="utf-8") as f:
-        resumes = json.load(f)
+def segment_sections(text):
+    spans = {}
+    open_sections = {}
+    first_header = None
 
-    results = []
+    for m in SECTION_HEADER_PATTERN.finditer(text):
+        name = m.lastgroup
+        if first_header is None:
+            first_header = m.start()
 
-    for r in resumes:
-        text = r["raw_text"]
+        # A header closes every open section except its own
+        for other in [o for o in open_sections if o != name]:
+            spans[other] = (open_sections.pop(other), m.start())
 
-        skills = extract_skills(text)
-        experience_section = extract_experience_section(text)
-        experience_data = calculate_experience_years(text)
+        if name not in spans and name not in open_sections:
+            open_sections[name] = m.end()
 
-        result = {
-            "resume_id": r["resume_id"],
-            "filename": r["filename"],
-            "file_path": r.get("file_path", ""),
-            "raw_text": text,
-            "name": extract_name(text, r["filename"]),
-            "email": extract_email(text),
-            "skills": skills,
-            "experience_section": experience_section[:1000] if experience_section else "",
-            **experience_data
-        }
+        if not open_sections and len(spans) == len(SECTION_KEYWORDS):
+            break
 
-        results.append(result)
+    for name, start in open_sections.items():
+        spans[name] = (start, len(text))
 
-        print(f"{r['filename']}")
-        print(f"  Name: {result['name']}")
-        print(f"  Email: {result['email']}")
-        print(f"  Total Experience: {experience_data['total_experience_years']} years")
-        print()
+    email_match = EMAIL_PATTERN.search(text)
+    if email_match:
+        spans["email"] = email_match.span()
+        spans["contact"] = (0, email_match.end())
+    else:
+        spans["contact"] = (0, first_header if first_header is not None else len(text))
 
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-        json.dump(results, f, indent=2, ensure_ascii=False)
+    return spans
 
-    print(f"Saved to {OUTPUT_FILE}")
 
+def section_text(text, spans, name):
+    span = spans.get(name)
+    return text[span[0]:span[1]].strip() if span else ""
 
-if __name__ == "__main__":
-    run()
 
+def extract_sections(text, filename=""):
+    spans = segment_sections(text)
+
+    email_span = spans.get("email")
+    if email_span:
+        email = text[email_span[0]:email_span[1]]
+        search_area = normalize_name_text(text[:email_span[0]])
+    else:
+        email = "Not found"
+        search_area = normalize_name_text(text[:NAME_SCAN_CHARS])
+        if len(search_area) < 100 and len(text) > NAME_SCAN_CHARS:
+            search_area = normalize_name_text(text)
+        search_area = search_area[:100]
+
+    return {
+        "name": name_from_search_area(search_area, filename),
+        "email": email,
+        "skills": split_skills(section_text(text, spans, "skills")),
+        "experience_section": section_text(text, spans, "experience"),
+        "projects_section": section_text(text, spans, "projects"),
+        "education_section": section_text(text, spans, "education")
+    }
+
+
+def process_resume(r):
+    """One step1 record -> step2 record, using a single segmenter pass for the sections.
+
+    calculate_experience_years deliberately still scans the full text, not the experience
+    span: many resumes list their dated roles under headers the segmenter does not treat as
+    experience (internships, projects, per-employer headings), or have no experience header
+    at all. On the 550-resume corpus the span gives a different total for 515 resumes,
+    mostly 0.0, which would drop them from every min_experience filter. The full scan costs
+    about 2.5 ms per resume against 0.2 ms on the span.
+    """
+    text = r["raw_text"]
+
+    sections = extract_sections(text, r["filename"])
+    experience_section = sections["experience_section"]
+    experience_data = calculate_experience_years(text)
+
+    result = {
+        "resume_id": r["resume_id"],
+        "filename": r["filename"],
+        "file_path": r.get("file_path", ""),
+        "raw_text": text,
+        "name": sections["name"],
+        "email": sections["email"],
+        "skills": sections["skills"],
+        "experience_section": experience_section[:1000] if experience_section else "",
+        **experience_data
+    }
+
+    matcher = load_matcher()
+    if matcher:
+        result["gazetteer_skills"] = matcher.match(
+            f"{result['skills']}\n\n{result['experience_section']}"
+        )
+        result["gazetteer_coverage"] = round(coverage(result["skills"], matcher), 3)
+
+    print(f"{r['filename']}")
+    print(f"  Name: {result['name']}")
+    print(f"  Email: {result['email']}")
+    print(f"  Total Experience: {experience_data['total_experience_years']} years")
+    print()
+
+    return result
+
+
+def run(input_file=INPUT_FILE, output_file=OUTPUT_FILE, follow=False):
+    resumes = iter_records(input_file, follow=follow)
+    count = write_records(output_file, (process_resume(r) for r in resumes))
+
+    print(f"Saved {count} resumes to {output_file}")
+
+
+def benchmark(input_file=INPUT_FILE, repeat=3):
+    resumes = [(r["raw_text"], r["filename"]) for r in iter_records(input_file)]
+
+    def legacy():
+        return [
+            (extract_name(text, filename), extract_email(text),
+             extract_skills(text), extract_experience_section(text))
+            for text, filename in resumes
+        ]
+
+    def segmented():
+        results = []
+        for text, filename in resumes:
+            sections = extract_sections(text, filename)
+            results.append((sections["name"], sections["email"],
+                            sections["skills"], sections["experience_section"]))
+        return results
+
+    timings = {}
+    outputs = {}
+    for label, fn in (("legacy", legacy), ("segmented", segmented)):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            outputs[label] = fn()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        timings[label] = best
+
+    agree = sum(a == b for a, b in zip(outputs["legacy"], outputs["segmented"]))
+
+    print(f"Resumes          : {len(resumes)}")
+    print(f"Legacy extractors: {timings['legacy'] * 1000:.1f} ms")
+    print(f"Single-pass      : {timings['segmented'] * 1000:.1f} ms")
+    print(f"Speedup          : {timings['legacy'] / max(timings['segmented'], 1e-9):.2f}x")
+    print(f"Identical output : {agree}/{len(resumes)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", default=INPUT_FILE, help="step1 output (.json or .jsonl)")
+    parser.add_argument("--output", default=OUTPUT_FILE, help="step2 output (.json or .jsonl)")
+    parser.add_argument("--follow", action="store_true",
+                        help="keep reading a .jsonl input until the upstream stage finishes")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="time the single-pass segmenter against the per-section extractors")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.input)
+    else:
+        run(args.input, args.output, follow=args.follow)
@@ -24,6 +24,9 @@ VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
 
 for r in resumes:
 
+    if r.get("deleted"):
+        continue
+
     meta = r.get("metadata", {})
 
     values = (
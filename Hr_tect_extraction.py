@@ -1,10 +1,17 @@
 import os
 import json
 import re
+import time
+import argparse
 import pdfplumber
+from concurrent.futures import ProcessPoolExecutor
+from pipeline_io import RecordWriter, iter_records, write_json_atomic
+from text_cache import file_sha256, load_cached_text, save_cached_text
 
 RESUME_FOLDER = "D:/project_2_resumes"
 OUTPUT_FILE = "steps1_raw_text.json"
+MANIFEST_FILE = "steps1_manifest.json"
+DEFAULT_WORKERS = 1
 
 def clean_text(text):
     if not text:
@@ -13,81 +20,303 @@ def clean_text(text):
     text = text.replace('\x00', '')
     return text.strip()
 
-def extract_from_pdf(path):
+def extract_pdf_pages(path):
     full_text = ""
+    pages = 0
     try:
         with pdfplumber.open(path) as pdf:
             for page in pdf.pages:
+                pages += 1
                 t = page.extract_text()
                 if t:
                     full_text += t + "\n"
     except Exception as e:
+        # None, not "": a read failure must not be remembered as an empty resume
         print(f"Error reading {path}: {e}")
-    return full_text
+        return None, pages
+    return full_text, pages
 
 
-def run():
+def extract_from_pdf(path):
+    full_text, _ = extract_pdf_pages(path)
+    return full_text or ""
 
-    if os.path.exists(OUTPUT_FILE):
-        try:
-            with open(OUTPUT_FILE, "r", encoding="utf-8") as f:
-                all_resumes = json.load(f)
-            print(f"Loaded {len(all_resumes)} existing resumes")
-        except:
-            print("Existing JSON corrupted. Starting fresh.")
-            all_resumes = []
-    else:
-        all_resumes = []
 
-    processed_ids = {r["resume_id"] for r in all_resumes}
+def read_resume(path):
+    if path.lower().endswith(".pdf"):
+        return extract_pdf_pages(path)
 
-    if not os.path.exists(RESUME_FOLDER):
-        print("Folder not found!")
+    try:
+        with open(path, "r", errors="ignore", encoding="utf-8") as f:
+            return f.read(), 1
+    except Exception as e:
+        print(f"Error reading {path}: {e}")
+        return None, 0
+
+
+def read_resumes(paths, workers=DEFAULT_WORKERS):
+    if workers <= 1 or len(paths) <= 1:
+        for path in paths:
+            yield read_resume(path)
         return
 
-    files = [f for f in os.listdir(RESUME_FOLDER)
-             if f.lower().endswith((".pdf", ".txt"))]
+    chunksize = max(1, len(paths) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # map() yields in submission order, so output order matches the sorted file list
+        yield from pool.map(read_resume, paths, chunksize=chunksize)
 
-    print(f"Found {len(files)} resumes in folder")
 
-    new_count = 0
+def load_manifest():
+    if not os.path.exists(MANIFEST_FILE):
+        return {}
+    try:
+        with open(MANIFEST_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except:
+        print("Manifest corrupted. Rebuilding it.")
+        return {}
 
-    for file in files:
 
+def load_existing_ids(output_file):
+    # None when the output exists but cannot be read
+    if not os.path.exists(output_file):
+        return set()
+    try:
+        return {r["resume_id"] for r in iter_records(output_file)}
+    except:
+        print("Existing JSON corrupted. Starting fresh.")
+        return None
+
+
+def reconcile_manifest(manifest, processed_ids):
+    # The manifest only vouches for files whose record is in this output; anything
+    # else (output deleted, corrupted or a different --output) is extracted again
+    dropped = [file for file, entry in manifest.items()
+               if file not in processed_ids and not entry.get("empty")]
+    for file in dropped:
+        del manifest[file]
+    return len(dropped)
+
+
+def bootstrap_manifest(manifest, files, processed_ids):
+    # Trust what is already in the output file for files the manifest does not know
+    added = 0
+    for file in files:
         if file in processed_ids:
-            print(f"Skipping already processed: {file}")
-            continue
+            path = os.path.join(RESUME_FOLDER, file)
+            st = os.stat(path)
+            manifest[file] = {
+                "sha256": file_sha256(path),
+                "size": st.st_size,
+                "mtime": st.st_mtime
+            }
+            added += 1
+
+    return added
+
+
+def changed_path(output_file):
+    return output_file + ".changed.jsonl"
+
+
+def rewrite_with_changes(output_file, changed_file, offsets, changed_ids):
+    # Second pass for replaced files: stream the output through, swapping each changed
+    # record for its re-extracted version (read back from changed_file by offset) and
+    # dropping the ones that came back empty, so the corpus is never held in memory
+    seen = set()
+    with RecordWriter(output_file, atomic=True) as writer, \
+            open(changed_file, "r", encoding="utf-8") as changed:
+
+        def replacement(rid):
+            changed.seek(offsets[rid])
+            return json.loads(changed.readline())
+
+        if os.path.exists(output_file):
+            for r in iter_records(output_file):
+                rid = r["resume_id"]
+                if rid in changed_ids:
+                    seen.add(rid)
+                    if rid in offsets:
+                        writer.write(replacement(rid))
+                    continue
+                writer.write(r)
+
+        for rid in offsets:
+            if rid not in seen:
+                writer.write(replacement(rid))
 
+
+def find_changes(files, manifest):
+    new_files = []
+    changed_files = []
+    previous = {}
+
+    for file in files:
         path = os.path.join(RESUME_FOLDER, file)
+        st = os.stat(path)
+        entry = manifest.get(file)
+
+        if entry and entry["size"] == st.st_size and entry["mtime"] == st.st_mtime:
+            continue
+
+        digest = file_sha256(path)
+
+        if entry and entry["sha256"] == digest:
+            entry["mtime"] = st.st_mtime
+            continue
+
+        manifest[file] = {
+            "sha256": digest,
+            "size": st.st_size,
+            "mtime": st.st_mtime
+        }
 
+        if entry:
+            changed_files.append(file)
+            previous[file] = entry
+        else:
+            new_files.append(file)
+
+    return new_files, changed_files, previous
+
+
+def extract_texts(files, manifest, workers):
+    cached = {}
+    misses = []
+
+    for file in files:
+        path = os.path.join(RESUME_FOLDER, file)
+        text = None
         if file.lower().endswith(".pdf"):
-            raw_text = extract_from_pdf(path)
+            text = load_cached_text(manifest[file]["sha256"])
+        if text is None:
+            misses.append(path)
         else:
-            with open(path, "r", errors="ignore", encoding="utf-8") as f:
-                raw_text = f.read()
+            cached[file] = text
 
-        cleaned = clean_text(raw_text)
+    print(f"Text cache: {len(cached)} hit(s), {len(misses)} file(s) to extract "
+          f"with {workers} worker(s)")
 
-        if not cleaned:
-            print(f"Empty content: {file}")
+    extracted = read_resumes(misses, workers)
+
+    for file in files:
+        if file in cached:
+            yield file, cached[file], 0
             continue
 
-        all_resumes.append({
-            "resume_id": file,
-            "filename": file,
-            "file_path": path,
-            "raw_text": cleaned
-        })
+        raw_text, pages = next(extracted)
+        if raw_text and file.lower().endswith(".pdf"):
+            save_cached_text(manifest[file]["sha256"], raw_text)
+        yield file, raw_text, pages
 
-        new_count += 1
-        print(f"Processed NEW resume: {file}")
 
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-        json.dump(all_resumes, f, indent=2, ensure_ascii=False)
+def run(workers=DEFAULT_WORKERS, output_file=OUTPUT_FILE):
 
-    print(f"\nAdded {new_count} new resumes.")
-    print(f"Total resumes stored: {len(all_resumes)}")
+    if not os.path.exists(RESUME_FOLDER):
+        print("Folder not found!")
+        return
 
-if __name__ == "__main__":
-    run()
+    files = sorted(f for f in os.listdir(RESUME_FOLDER)
+                   if f.lower().endswith((".pdf", ".txt")))
+
+    print(f"Found {len(files)} resumes in folder")
+
+    manifest = load_manifest()
+    processed_ids = load_existing_ids(output_file)
+    fresh = processed_ids is None
+    processed_ids = processed_ids or set()
+
+    # Records already in the output but missing from the manifest (first run with a
+    # manifest, or a run stopped before saving it) are trusted as they are
+    bootstrapped = bootstrap_manifest(manifest, [f for f in files if f not in manifest], processed_ids)
+    if bootstrapped:
+        print(f"Manifest bootstrapped from {output_file}: {bootstrapped} files")
+    dropped = reconcile_manifest(manifest, processed_ids)
+    if dropped:
+        print(f"{dropped} manifest entries have no record in {output_file}, extracting them again")
+
+    new_files, changed_files, previous = find_changes(files, manifest)
+    print(f"Unchanged: {len(files) - len(new_files) - len(changed_files)}, "
+          f"new: {len(new_files)}, changed: {len(changed_files)}")
 
+    workers = workers if workers > 0 else (os.cpu_count() or 1)
+
+    added = 0
+    changed_ids = set(changed_files)
+    offsets = {}
+    total_pages = 0
+    pending = new_files + changed_files
+    started = time.perf_counter()
+
+    failed = []
+
+    if fresh and os.path.exists(output_file):
+        os.remove(output_file)
+
+    # New records are appended as they are extracted, so a --follow step 2 starts on
+    # them at once; changed ones wait in a side file for the rewrite pass below
+    with RecordWriter(output_file, append=True) as writer, \
+            open(changed_path(output_file), "w", encoding="utf-8") as changed:
+
+        for file, raw_text, pages in extract_texts(pending, manifest, workers):
+
+            total_pages += pages
+            if raw_text is None:
+                # Forget the new hash so the next run tries the file again
+                failed.append(file)
+                changed_ids.discard(file)
+                if file in previous:
+                    manifest[file] = previous[file]
+                else:
+                    del manifest[file]
+                continue
+
+            cleaned = clean_text(raw_text)
+            manifest[file]["empty"] = not cleaned
+
+            if not cleaned:
+                print(f"Empty content: {file}")
+                continue
+
+            record = {
+                "resume_id": file,
+                "filename": file,
+                "file_path": os.path.join(RESUME_FOLDER, file),
+                "raw_text": cleaned
+            }
+
+            if file in changed_ids:
+                offsets[file] = changed.tell()
+                changed.write(json.dumps(record, ensure_ascii=False) + "\n")
+                print(f"Re-extracted CHANGED resume: {file}")
+            else:
+                writer.write(record)
+                added += 1
+                print(f"Processed NEW resume: {file}")
+
+    elapsed = time.perf_counter() - started
+
+    if changed_ids:
+        rewrite_with_changes(output_file, changed_path(output_file), offsets, changed_ids)
+    os.remove(changed_path(output_file))
+
+    write_json_atomic(MANIFEST_FILE, manifest)
+
+    print(f"\nAdded {added} new resumes.")
+    print(f"Updated {len(offsets)} changed resumes.")
+    if failed:
+        print(f"{len(failed)} files could not be read and will be retried next run: {failed[:20]}")
+
+    if pending and elapsed > 0:
+        print(f"Throughput: {len(pending) / elapsed:.2f} files/sec, "
+              f"{total_pages / elapsed:.2f} pages/sec "
+              f"({len(pending)} files, {total_pages} pages in {elapsed:.1f}s)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help="extraction processes (0 = one per CPU core)")
+    parser.add_argument("--output", default=OUTPUT_FILE,
+                        help="stage output (.json array or .jsonl)")
+    args = parser.parse_args()
+    run(workers=args.workers, output_file=args.output)
@@ -1,5 +1,6 @@
-import json
 import re
+import argparse
+from pipeline_io import iter_records, write_records
 
 INPUT_FILE = "step3_llm_output.json"
 OUTPUT_FILE = "step4_validated.json"
@@ -30,12 +31,7 @@ def validate_experience(exp):
     except:
         return 0.0
 
-with open(INPUT_FILE, "r", encoding="utf-8") as f:
-    data = json.load(f)
-
-results = []
-
-for r in data:
+def validate_record(r):
 
     extracted = r.get("extracted", r)
 
@@ -48,7 +44,7 @@ for r in data:
 
     file_path = r.get("file_path") or r.get("File_path", "")
 
-    results.append({
+    return {
         "resume_id": r.get("resume_id", ""),
         "filename": r.get("filename", ""),
         "raw_text": r.get("raw_text", ""),
@@ -59,10 +55,22 @@ for r in data:
         "experience_years": experience_years,
         "internship_years": internship_years,
         "total_experience_years": total_experience_years
-    })
+    }
+
+
+def run(input_file=INPUT_FILE, output_file=OUTPUT_FILE, follow=False):
+    data = iter_records(input_file, follow=follow)
+    count = write_records(output_file, (validate_record(r) for r in data))
+
+    print(f" Validation complete, saved to {output_file}")
+    print(f"Total resumes: {count}")
 
-with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-    json.dump(results, f, indent=2, ensure_ascii=False)
 
-print(f" Validation complete, saved to {OUTPUT_FILE}")
-print(f"Total resumes: {len(results)}")
\ No newline at end of file
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", default=INPUT_FILE, help="step3 output (.json or .jsonl)")
+    parser.add_argument("--output", default=OUTPUT_FILE, help="step4 output (.json or .jsonl)")
+    parser.add_argument("--follow", action="store_true",
+                        help="keep reading a .jsonl input until the upstream stage finishes")
+    args = parser.parse_args()
+    run(args.input, args.output, follow=args.follow)
@@ -1,39 +1,23 @@
 import os
 import json
-import torch
+import time
+import argparse
 import faiss
 import numpy as np
-from transformers import AutoTokenizer, AutoModel
+import embedding_service
+import faiss_index
+from metadata_store import write_store, store_path
+from skill_index import build_skill_index, index_path
+from bm25_index import build_bm25, resume_docs, RESUME_BM25_DIR, RESUME_TEXT_FILE
+from embedding_service import EMBED_BATCH_SIZE
+from index_versions import publish
 
 VALIDATED_JSON = "step4_validated.json"
 FAISS_INDEX_PATH = "resume_faiss.index"
-VECTOR_SIZE = 384
-HF_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+METADATA_FILE = "resume_metadata.json"
+DELTA_LOG = "resume_faiss.delta.jsonl"
 CHUNK_SIZE = 250
 CHUNK_OVERLAP = 50
-device = "cuda" if torch.cuda.is_available() else "cpu"
-tokenizer = AutoTokenizer.from_pretrained(HF_MODEL_NAME)
-model = AutoModel.from_pretrained(HF_MODEL_NAME).to(device)
-model.eval()
-
-def mean_pooling(model_output, attention_mask):
-    token_embeddings = model_output.last_hidden_state
-    input_mask_expanded = attention_mask.unsqueeze(-1).expand(token_embeddings.size()).float()
-    return torch.sum(token_embeddings * input_mask_expanded, dim=1) / torch.clamp(
-        input_mask_expanded.sum(dim=1), min=1e-9
-    )
-
-def embed_text(text):
-    encoded = tokenizer(text, truncation=True, padding=True, max_length=256, return_tensors="pt").to(device)
-
-    with torch.no_grad():
-        output = model(**encoded)
-
-    embedding = mean_pooling(output, encoded["attention_mask"])
-    vector = embedding.squeeze().cpu().numpy().astype("float32")
-
-    norm = np.linalg.norm(vector)
-    return (vector / norm if norm > 0 else vector).reshape(1, -1)
 
 
 def chunk_text(text, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
@@ -51,77 +35,115 @@ def chunk_text(text, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
     return chunks
 
 
-def build_faiss_index():
+def resume_entries(r):
+    # Metadata entries (one per chunk) for a validated resume record. Each chunk gets a
+    # stable id from resume_id, chunk number and text, so unchanged chunks keep their
+    # vector across incremental updates.
+    skills_text = ", ".join(r.get("skills", []))
+    exp_text = f"{r.get('experience_years', 0.0)} years experience"
+    intern_text = f"{r.get('internship_years', 0.0)} years internship"
 
-    if not os.path.exists(VALIDATED_JSON):
-        print(f"Error: {VALIDATED_JSON} not found!")
-        return
+    combined_text = f"""
+    Candidate with skills: {skills_text}.
+    Total experience: {exp_text}.
+    Internship experience: {intern_text}.
+    """
 
-    with open(VALIDATED_JSON, "r", encoding="utf-8") as f:
-        resumes = json.load(f)
+    combined_text = combined_text.strip()
 
-    vectors = []
-    metadata_store = []
+    entries = []
+    for chunk_no, chunk in enumerate(chunk_text(combined_text)):
 
-    print(f"Processing {len(resumes)} resumes")
+        entries.append({
 
-    for i, r in enumerate(resumes):
+            "resume_id": r.get("resume_id"),
+            "stable_id": faiss_index.stable_id(r.get("resume_id"), chunk_no, chunk),
+            "filename": r.get("filename"),
+            "file_path": r.get("file_path"),
+            "text": chunk,
 
-        skills_text = ", ".join(r.get("skills", []))
-        exp_text = f"{r.get('experience_years', 0.0)} years experience"
-        intern_text = f"{r.get('internship_years', 0.0)} years internship"
+            "metadata": {
+                "name": r.get("name", "Unknown"),
+                "email": r.get("email", "Unknown"),
+                "skills": r.get("skills", []),
+                "experience_years": r.get("experience_years", 0.0),
+                "internship_years": r.get("internship_years", 0.0),
+                "total_experience_years": r.get("total_experience_years", 0.0)
+            }
+        })
 
-        combined_text = f"""
-        Candidate with skills: {skills_text}.
-        Total experience: {exp_text}.
-        Internship experience: {intern_text}.
-        """
+    return entries
 
-        combined_text = combined_text.strip()
 
-        chunks = chunk_text(combined_text)
+def build_faiss_index(batch_size=EMBED_BATCH_SIZE, verify=0, index_options=None):
 
-        for chunk in chunks:
+    if not os.path.exists(VALIDATED_JSON):
+        print(f"Error: {VALIDATED_JSON} not found!")
+        return
 
-            vec = embed_text(chunk)
+    with open(VALIDATED_JSON, "r", encoding="utf-8") as f:
+        resumes = json.load(f)
 
-            vectors.append(vec)
+    metadata_store = []
 
-            metadata_store.append({
+    print(f"Processing {len(resumes)} resumes")
 
-                "resume_id": r.get("resume_id"),
-                "filename": r.get("filename"),
-                "file_path": r.get("file_path"),
-                "text": chunk,
+    for i, r in enumerate(resumes):
 
-                "metadata": {
-                    "name": r.get("name", "Unknown"),
-                    "email": r.get("email", "Unknown"),
-                    "skills": r.get("skills", []),
-                    "experience_years": r.get("experience_years", 0.0),
-                    "internship_years": r.get("internship_years", 0.0),
-                    "total_experience_years": r.get("total_experience_years", 0.0)
-                }
-            })
+        metadata_store.extend(resume_entries(r))
 
         if (i + 1) % 10 == 0 or (i + 1) == len(resumes):
             print(f"Processed {i+1}/{len(resumes)} resumes")
 
-    vectors = np.vstack(vectors).astype("float32")
+    texts = [entry["text"] for entry in metadata_store]
 
-    index = faiss.IndexFlatIP(vectors.shape[1])
-    index.add(vectors)
+    started = time.perf_counter()
+    vectors = embedding_service.encode(texts, batch_size)
+    elapsed = time.perf_counter() - started
+    print(f"Embedded {len(texts)} chunks in {elapsed:.1f}s "
+          f"({len(texts) / max(elapsed, 1e-9):.1f} chunks/sec, batch size {batch_size})")
+    print(embedding_service.summary())
+
+    if verify:
+        sample = texts[:verify]
+        reference = np.vstack([embedding_service.encode_one(t, use_cache=False) for t in sample])
+        print(f"Max |batched - per-chunk| over {len(sample)} chunks: "
+              f"{np.abs(vectors[:len(sample)] - reference).max():.2e}")
+
+    index = faiss_index.build_index(vectors, ids=[entry["stable_id"] for entry in metadata_store],
+                                    **(index_options or {}))
 
     faiss.write_index(index, FAISS_INDEX_PATH)
 
     print(f"\nFAISS index saved: {FAISS_INDEX_PATH}")
 
-    with open("resume_metadata.json", "w", encoding="utf-8") as f:
+    with open(METADATA_FILE, "w", encoding="utf-8") as f:
         json.dump(metadata_store, f, indent=2, ensure_ascii=False)
 
-    print("Metadata saved: resume_metadata.json")
+    print(f"Metadata saved: {METADATA_FILE}")
 
+    write_store(store_path(FAISS_INDEX_PATH), metadata_store, "resume_id")
+    build_skill_index(index_path(FAISS_INDEX_PATH), metadata_store)
 
-if __name__ == "__main__":
-    build_faiss_index()
+    if os.path.exists(RESUME_TEXT_FILE):
+        build_bm25(resume_docs(), RESUME_BM25_DIR)
+
+    # A full build supersedes any incremental changes logged against the previous index
+    if os.path.exists(DELTA_LOG):
+        os.remove(DELTA_LOG)
 
+    publish()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE,
+                        help="chunks per MiniLM forward pass")
+    parser.add_argument("--verify", type=int, default=0, metavar="N",
+                        help="re-embed the first N chunks one at a time and report the max difference")
+    parser.add_argument("--backend", choices=["torch", "onnx"], default=embedding_service.EMBED_BACKEND,
+                        help="embedding backend (default from EMBED_BACKEND)")
+    faiss_index.add_index_arguments(parser)
+    args = parser.parse_args()
+    embedding_service.set_backend(args.backend)
+    build_faiss_index(args.batch_size, args.verify, faiss_index.index_options(args))
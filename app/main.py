@@ -1,9 +1,40 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
 from app.models.query_model import QueryRequest
-from app.services.search import search_resumes
+import embedding_service
+from app.services.search import search_resumes_async, search_batcher
 from app.services.llm_service import rank_candidates
+from app.services.match_service import best_resumes, best_jobs
+from app.services.vector_service import reloader, cache_summary
+from app.services.admission import Overloaded, search_limiter, llm_limiter
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app):
+    # Model and resume index load before the first request (the index is then watched for
+    # new versions), and the search batcher starts on the server's event loop
+    await asyncio.gather(
+        asyncio.to_thread(reloader.start),
+        asyncio.to_thread(embedding_service.prewarm().join)
+    )
+    await search_batcher.start()
+    yield
+    await search_batcher.stop()
+    reloader.stop()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+@app.exception_handler(Overloaded)
+async def overloaded(request: Request, exc: Overloaded):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
 
 
 @app.get("/")
@@ -11,16 +42,78 @@ def home():
     return {"message": "AI Recruitment API Running"}
 
 
+@app.get("/admin/index")
+def index_status():
+
+    return reloader.status()
+
+
+@app.get("/admin/batcher")
+def batcher_status():
+
+    return search_batcher.summary()
+
+
+@app.get("/admin/admission")
+def admission_status():
+
+    return {"search": search_limiter.summary(), "llm": llm_limiter.summary()}
+
+
+@app.get("/admin/cache")
+def cache_status():
+
+    return cache_summary()
+
+
 @app.post("/llm/query")
-def query_llm(request: QueryRequest):
+async def query_llm(request: QueryRequest):
 
     query = request.query
 
-    results = search_resumes(query)
+    filters = {"min_experience": request.min_experience, "max_experience": request.max_experience}
 
-    ranked_results = rank_candidates(results)
+    # The LLM place is held before searching: when ranking is full the request is shed
+    # before it pays for an embedding and a search
+    async with llm_limiter.reserve() as llm_place:
+        results = await search_resumes_async(query, request.top_k, filters)
+
+        await llm_place.acquire()
+        ranked_results = await asyncio.to_thread(rank_candidates, results)
 
     return {
         "query": query,
         "results": ranked_results
-    }
\ No newline at end of file
+    }
+
+
+@app.get("/match/job/{job_id}")
+def match_job(job_id: str, n: int = 10):
+
+    results = best_resumes(job_id, n)
+
+    if results is None:
+        raise HTTPException(status_code=503, detail="Cross-match tables not built")
+    if not results:
+        raise HTTPException(status_code=404, detail=f"Unknown job_id: {job_id}")
+
+    return {
+        "job_id": job_id,
+        "results": results
+    }
+
+
+@app.get("/match/resume/{resume_id}")
+def match_resume(resume_id: str, n: int = 10):
+
+    results = best_jobs(resume_id, n)
+
+    if results is None:
+        raise HTTPException(status_code=503, detail="Cross-match tables not built")
+    if not results:
+        raise HTTPException(status_code=404, detail=f"Unknown resume_id: {resume_id}")
+
+    return {
+        "resume_id": resume_id,
+        "results": results
+    }
@@ -1,5 +1,19 @@
-from pydantic import BaseModel
+import os
+from typing import Optional
+from pydantic import BaseModel, Field, model_validator
+
+# top_k is part of the result-cache key and sizes the FAISS search, so it is bounded
+MAX_TOP_K = int(os.getenv("MAX_TOP_K", "100"))
 
 class QueryRequest(BaseModel):
     user_type: str
-    query: str
\ No newline at end of file
+    query: str
+    top_k: int = Field(5, ge=1, le=MAX_TOP_K)
+    min_experience: float = Field(0.0, ge=0)
+    max_experience: Optional[float] = None
+
+    @model_validator(mode="after")
+    def check_experience_range(self):
+        if self.max_experience is not None and self.max_experience < self.min_experience:
+            raise ValueError("max_experience must not be below min_experience")
+        return self
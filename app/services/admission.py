@@ -0,0 +1,145 @@
+import os
+import asyncio
+from collections import deque
+
+
+class Overloaded(Exception):
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"{name} is at capacity, retry in {retry_after}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class AdmissionLimiter:
+    # At most max_in_flight requests run; up to max_queue more wait, each for at most
+    # max_wait seconds. Anything beyond that is shed at once with Overloaded, so a burst
+    # turns into fast 503s instead of a growing backlog on the threadpool.
+
+    def __init__(self, name, max_in_flight, max_queue, max_wait, retry_after):
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self.waiters = deque()
+        self.reserved = 0
+        self.stats = {"admitted": 0, "shed_queue_full": 0, "shed_timeout": 0}
+
+    @property
+    def waiting(self):
+        return len(self.waiters)
+
+    def _shed(self, reason):
+        self.stats[reason] += 1
+        return Overloaded(self.name, self.retry_after)
+
+    def _full(self):
+        return self.in_flight + self.waiting + self.reserved >= self.max_in_flight + self.max_queue
+
+    async def _acquire(self, reserved=False):
+        # Counting happens before the first await, so requests arriving in the same
+        # event-loop tick see each other and the bounds hold for a burst. A reserved
+        # request already holds its place and is not checked again.
+        if self.in_flight < self.max_in_flight and not self.waiters:
+            self.in_flight += 1
+            self.stats["admitted"] += 1
+            return
+        if not reserved and self._full():
+            raise self._shed("shed_queue_full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.max_wait)
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as the wait ended: pass it on
+                self._release()
+            elif waiter in self.waiters:
+                self.waiters.remove(waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                raise self._shed("shed_timeout") from None
+            raise
+
+        # _release handed this waiter its slot, in_flight already counts it
+        self.stats["admitted"] += 1
+
+    async def __aenter__(self):
+        await self._acquire()
+        return self
+
+    def _release(self):
+        # A finished request's slot goes straight to the oldest waiter, if any
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    async def __aexit__(self, *exc):
+        self._release()
+        return False
+
+    def reserve(self):
+        return Reservation(self)
+
+    def summary(self):
+        return dict(
+            self.stats, in_flight=self.in_flight, queue_depth=self.waiting, reserved=self.reserved,
+            max_in_flight=self.max_in_flight, max_queue=self.max_queue,
+            max_wait_seconds=self.max_wait, retry_after_seconds=self.retry_after
+        )
+
+
+class Reservation:
+    # A place in the limiter taken before the work that leads up to the limited step (the
+    # search ahead of LLM ranking), so a request that would be shed is shed before doing
+    # that work. acquire() then turns the place into a slot; leaving the block gives back
+    # whichever of the two is held.
+
+    def __init__(self, limiter):
+        self.limiter = limiter
+        self.held = False
+        self.acquired = False
+
+    async def __aenter__(self):
+        if self.limiter._full():
+            raise self.limiter._shed("shed_queue_full")
+        self.limiter.reserved += 1
+        self.held = True
+        return self
+
+    async def acquire(self):
+        self.limiter.reserved -= 1
+        self.held = False
+        await self.limiter._acquire(reserved=True)
+        self.acquired = True
+
+    async def __aexit__(self, *exc):
+        if self.acquired:
+            self.limiter._release()
+        elif self.held:
+            self.limiter.reserved -= 1
+        self.held = self.acquired = False
+        return False
+
+
+def limiter_from_env(name, prefix, max_in_flight, max_queue, max_wait, retry_after):
+    return AdmissionLimiter(
+        name,
+        int(os.getenv(f"{prefix}_MAX_IN_FLIGHT", str(max_in_flight))),
+        int(os.getenv(f"{prefix}_MAX_QUEUE", str(max_queue))),
+        float(os.getenv(f"{prefix}_MAX_WAIT", str(max_wait))),
+        int(os.getenv(f"{prefix}_RETRY_AFTER", str(retry_after)))
+    )
+
+
+# Searches are cheap and batched, so many may run at once; LLM ranking is slow and
+# heavy, so few do. Separate limits keep searches from queueing behind LLM calls.
+# /llm/query reserves its LLM place before searching; the LLM queue holds at least one
+# full search batch (SEARCH_MAX_BATCH) so a batch's results are not shed on arrival.
+search_limiter = limiter_from_env("search", "SEARCH", 64, 128, 0.5, 1)
+llm_limiter = limiter_from_env("llm", "LLM", 4, 32, 5.0, 5)
@@ -0,0 +1,90 @@
+import asyncio
+import time
+
+
+class MicroBatcher:
+    # Collects concurrent submissions for up to max_wait_ms (or until max_batch arrive),
+    # runs handler(items) once on a worker thread and resolves each caller's future with
+    # its own result. handler must return one result per item, in order. One batch runs
+    # at a time; the next one keeps filling while it does, so batches grow with load.
+
+    def __init__(self, handler, max_batch=32, max_wait_ms=5.0):
+        self.handler = handler
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.queue = None
+        self.task = None
+        self.inflight = None
+        self.stats = {"batches": 0, "items": 0, "largest": 0}
+
+    async def start(self):
+        if self.task is None:
+            self.queue = asyncio.Queue()
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        if self.inflight is not None:
+            await self.inflight
+            self.inflight = None
+
+    async def submit(self, item):
+        if self.task is None:
+            await self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((item, future))
+        return await future
+
+    async def _collect(self):
+        batch = [await self.queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+
+        if self.inflight is not None and not self.inflight.done():
+            await asyncio.wait([self.inflight])
+            while len(batch) < self.max_batch and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            # Callers that gave up (client disconnect) are dropped before the work starts
+            batch = [(item, future) for item, future in batch if not future.done()]
+            if batch:
+                self.inflight = asyncio.create_task(self._dispatch(batch))
+
+    async def _dispatch(self, batch):
+        self.stats["batches"] += 1
+        self.stats["items"] += len(batch)
+        self.stats["largest"] = max(self.stats["largest"], len(batch))
+
+        try:
+            results = await asyncio.to_thread(self.handler, [item for item, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def summary(self):
+        batches = max(self.stats["batches"], 1)
+        return dict(self.stats, mean=round(self.stats["items"] / batches, 2),
+                    max_batch=self.max_batch, max_wait_ms=self.max_wait * 1000)
@@ -0,0 +1,18 @@
+from cross_match import load_cross_match
+
+
+def best_resumes(job_id, n=10):
+    # None: tables not built / stale; []: unknown job
+    tables = load_cross_match()
+    if tables is None:
+        return None
+    hits = tables.best_resumes(job_id, n) or []
+    return [{"resume_id": resume_id, "similarity_score": score} for resume_id, score in hits]
+
+
+def best_jobs(resume_id, n=10):
+    tables = load_cross_match()
+    if tables is None:
+        return None
+    hits = tables.best_jobs(resume_id, n) or []
+    return [{"job_id": job_id, "similarity_score": score} for job_id, score in hits]
@@ -0,0 +1,70 @@
+import time
+import threading
+from collections import OrderedDict
+
+
+def normalize_query(query):
+    # MiniLM is uncased, so case and spacing never change the embedding or the results
+    return " ".join(str(query).lower().split())
+
+
+class LRUCache:
+    # Thread-safe LRU with a TTL, bounded by entry count and by approximate bytes. Each
+    # value's size is given by the caller on put, so no deep sizing happens here.
+
+    def __init__(self, max_entries, max_bytes, ttl_seconds):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl_seconds
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+
+    def get(self, key, record_miss=True):
+        # record_miss=False for a fast-path probe that falls back to a counted lookup
+        with self.lock:
+            item = self.entries.get(key)
+            if item is not None and time.monotonic() - item[2] > self.ttl:
+                self._drop(key)
+                self.stats["expired"] += 1
+                item = None
+            if item is None:
+                if record_miss:
+                    self.stats["misses"] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return item[0]
+
+    def put(self, key, value, size):
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self._drop(key)
+            self.entries[key] = (value, size, time.monotonic())
+            self.bytes += size
+            while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+                self._drop(next(iter(self.entries)))
+                self.stats["evictions"] += 1
+
+    def _drop(self, key):
+        _, size, _ = self.entries.pop(key)
+        self.bytes -= size
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def summary(self):
+        with self.lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return dict(
+                self.stats,
+                hit_ratio=round(self.stats["hits"] / lookups, 4) if lookups else 0.0,
+                entries=len(self.entries), max_entries=self.max_entries,
+                mb=round(self.bytes / 1e6, 3), max_mb=round(self.max_bytes / 1e6, 3),
+                ttl_seconds=self.ttl
+            )
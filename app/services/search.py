@@ -1,7 +1,50 @@
-from app.services.vector_service import search_vectors
+import os
+import asyncio
+from collections import defaultdict
+from app.services.vector_service import search_vectors, search_many, cached_results, filter_key
+from app.services.batcher import MicroBatcher
+from app.services.admission import search_limiter
 
-def search_resumes(query):
+# Concurrent API queries are encoded and searched together; SEARCH_BATCHING=0 sends
+# each query through on its own
+SEARCH_BATCHING = os.getenv("SEARCH_BATCHING", "1") == "1"
+SEARCH_MAX_BATCH = int(os.getenv("SEARCH_MAX_BATCH", "32"))
+SEARCH_MAX_WAIT_MS = float(os.getenv("SEARCH_MAX_WAIT_MS", "2"))
 
-    results = search_vectors(query)
 
-    return results
\ No newline at end of file
+def search_batch(items):
+    # items: (query, top_k, filters); one search per distinct top_k/filters in the batch
+    groups = defaultdict(list)
+    for i, (_, top_k, filters) in enumerate(items):
+        groups[(top_k, filter_key(filters))].append(i)
+
+    results = [None] * len(items)
+    for rows in groups.values():
+        _, top_k, filters = items[rows[0]]
+        for row, result in zip(rows, search_many([items[r][0] for r in rows], top_k, filters)):
+            results[row] = result
+    return results
+
+
+search_batcher = MicroBatcher(search_batch, SEARCH_MAX_BATCH, SEARCH_MAX_WAIT_MS)
+
+
+def search_resumes(query, top_k=5, filters=None):
+
+    results = search_vectors(query, top_k, filters)
+
+    return results
+
+
+async def search_resumes_async(query, top_k=5, filters=None):
+
+    # Cached answers skip admission and the batcher entirely
+    results = cached_results(query, top_k, filters)
+    if results is not None:
+        return results
+
+    async with search_limiter:
+        if SEARCH_BATCHING:
+            return await search_batcher.submit((query, top_k, filters))
+
+        return await asyncio.to_thread(search_resumes, query, top_k, filters)
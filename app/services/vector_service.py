@@ -1,24 +1,200 @@
-import faiss
+import os
 import json
-from sentence_transformers import SentenceTransformer
+import time
+import threading
+import numpy as np
+import faiss_index
+import index_versions
+from embedding_service import encode, model_slug
+from metadata_store import open_store
+from search_filters import VectorFilter, filtered_params
+from app.services.query_cache import LRUCache, normalize_query
 
-model = SentenceTransformer("all-MiniLM-L6-v2")
+INDEX_FILE = "resume_faiss.index"
+METADATA_FILE = "resume_metadata.json"
+INDEX_POLL_SECONDS = float(os.getenv("INDEX_POLL_SECONDS", "5"))
 
-index = faiss.read_index("resume_faiss.index")
+# In-process caches for repeated API queries. Results are keyed by index version, so a
+# reload makes every older entry unreachable; query embeddings only depend on the model.
+RESULT_CACHE_ENTRIES = int(os.getenv("RESULT_CACHE_ENTRIES", "2048"))
+RESULT_CACHE_MB = float(os.getenv("RESULT_CACHE_MB", "64"))
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "300"))
+QUERY_EMBED_CACHE_ENTRIES = int(os.getenv("QUERY_EMBED_CACHE_ENTRIES", "8192"))
+QUERY_EMBED_CACHE_MB = float(os.getenv("QUERY_EMBED_CACHE_MB", "16"))
+QUERY_EMBED_CACHE_TTL = float(os.getenv("QUERY_EMBED_CACHE_TTL", "3600"))
 
-with open("resume_metadata.json", "r") as f:
-    metadata = json.load(f)
 
+class LoadedIndex:
+    # One index/metadata pair. Queries take a reference to the active pair and use only
+    # it, so a swap never mixes versions and the old pair lives until its last query ends.
 
-def search_vectors(query, top_k=5):
+    def __init__(self, version, directory):
+        started = time.perf_counter()
+        index_path = os.path.join(directory, INDEX_FILE)
+        self.version = version
+        self.index = faiss_index.read_index(index_path)
+        self.metadata = open_store(index_path, os.path.join(directory, METADATA_FILE), "resume_id")
+        self.vector_filter = VectorFilter(self.metadata)
+        if self.index.ntotal != len(self.metadata):
+            raise RuntimeError(f"{version}: {self.index.ntotal} vectors but {len(self.metadata)} metadata rows")
 
-    query_embedding = model.encode([query])
+        self.loaded_at = time.time()
+        self.load_seconds = time.perf_counter() - started
 
-    D, I = index.search(query_embedding, top_k)
+    def info(self):
+        return {
+            "version": self.version,
+            "vectors": int(self.index.ntotal),
+            "loaded_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.loaded_at)),
+            "load_seconds": round(self.load_seconds, 3)
+        }
 
-    results = []
 
-    for idx in I[0]:
-        results.append(metadata[idx])
+class IndexReloader:
+    # Loads the version named in index_versions/manifest.json and polls it for changes.
+    # A new version is verified and loaded on the watcher thread, then swapped in with one
+    # assignment; a version that fails to load is skipped (until the manifest moves on)
+    # and the current one stays.
+    # Without a manifest the index files in the working directory are served.
 
-    return results
\ No newline at end of file
+    def __init__(self, root=index_versions.INDEX_VERSIONS_DIR, poll_seconds=INDEX_POLL_SECONDS):
+        self.root = root
+        self.poll_seconds = poll_seconds
+        self.active = None
+        self.last_error = None
+        self.failed_version = None
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def _target(self):
+        manifest = index_versions.read_manifest(self.root)
+        if manifest is None:
+            return "working-dir", "."
+        return manifest["active"], index_versions.version_dir(manifest["active"], self.root)
+
+    def check(self):
+        # Loads and swaps in the manifest's version if it is not the active one
+        with self.lock:
+            version, directory = self._target()
+            if self.active is not None and version in (self.active.version, self.failed_version):
+                return False
+            try:
+                if version != "working-dir":
+                    index_versions.verify_version(version, self.root)
+                loaded = LoadedIndex(version, directory)
+            except Exception as e:
+                self.last_error = str(e)
+                self.failed_version = version
+                print(f"Index reload failed, keeping {self.active.version if self.active else 'nothing'}: {e}")
+                return False
+
+            previous = self.active
+            self.active = loaded
+            self.last_error = None
+            self.failed_version = None
+            print(f"Index {version} active ({loaded.index.ntotal} vectors, loaded in {loaded.load_seconds:.2f}s"
+                  f"{', replaced ' + previous.version if previous else ''})")
+            return True
+
+    def current(self):
+        if self.active is None:
+            self.check()
+        if self.active is None:
+            raise RuntimeError(f"No resume index could be loaded: {self.last_error}")
+        return self.active
+
+    def _watch(self):
+        while not self.stop_event.wait(self.poll_seconds):
+            self.check()
+
+    def start(self):
+        self.check()
+        if self.thread is None:
+            self.stop_event.clear()
+            self.thread = threading.Thread(target=self._watch, name="index-reloader", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def status(self):
+        status = self.active.info() if self.active else {"version": None}
+        status["last_error"] = self.last_error
+        status["poll_seconds"] = self.poll_seconds
+        return status
+
+
+reloader = IndexReloader()
+
+
+result_cache = LRUCache(RESULT_CACHE_ENTRIES, int(RESULT_CACHE_MB * 1e6), RESULT_CACHE_TTL)
+embedding_cache = LRUCache(QUERY_EMBED_CACHE_ENTRIES, int(QUERY_EMBED_CACHE_MB * 1e6), QUERY_EMBED_CACHE_TTL)
+
+
+def filter_key(filters):
+    # Hashable, order-independent form of the VectorFilter.mask() keyword arguments
+    return tuple(sorted((k, tuple(v) if isinstance(v, (list, set, tuple)) else v)
+                        for k, v in (filters or {}).items() if v is not None))
+
+
+def result_key(version, query, top_k, filters):
+    return version, normalize_query(query), top_k, filter_key(filters)
+
+
+def cached_results(query, top_k=5, filters=None):
+    active = reloader.active
+    if active is None:
+        return None
+    return result_cache.get(result_key(active.version, query, top_k, filters), record_miss=False)
+
+
+def embed_queries(queries):
+    # Normalized queries are embedded once; API queries stay out of the on-disk corpus cache
+    keys = [(model_slug(), normalize_query(q)) for q in queries]
+    vectors = [embedding_cache.get(key) for key in keys]
+
+    missing = list(dict.fromkeys(key for key, v in zip(keys, vectors) if v is None))
+    if missing:
+        fresh = dict(zip(missing, encode([text for _, text in missing], use_cache=False)))
+        for key, vector in fresh.items():
+            embedding_cache.put(key, vector, vector.nbytes + len(key[1]))
+        vectors = [fresh.get(key) if v is None else v for key, v in zip(keys, vectors)]
+
+    return np.vstack(vectors).astype("float32")
+
+
+def search_many(queries, top_k=5, filters=None):
+    # One encode and one index.search for the queries not already cached, results in
+    # query order. Everything below uses the one index version taken here.
+    active = reloader.current()
+    keys = [result_key(active.version, q, top_k, filters) for q in queries]
+    results = [result_cache.get(key) for key in keys]
+
+    todo = [i for i, r in enumerate(results) if r is None]
+    if todo:
+        query_embeddings = embed_queries([queries[i] for i in todo])
+
+        params = filtered_params(active.index, active.vector_filter.mask(**(filters or {})))
+
+        D, I = active.index.search(query_embeddings, top_k, params=params)
+
+        entries = active.metadata.get_many(I.ravel())
+
+        for i, row in zip(todo, I):
+            results[i] = [entries[idx] for idx in row if idx in entries]
+            result_cache.put(keys[i], results[i], len(json.dumps(results[i], ensure_ascii=False)))
+
+    return results
+
+
+def search_vectors(query, top_k=5, filters=None):
+
+    return search_many([query], top_k, filters)[0]
+
+
+def cache_summary():
+    return {"results": result_cache.summary(), "query_embeddings": embedding_cache.summary()}
@@ -0,0 +1,190 @@
+import os
+import json
+import time
+import argparse
+from collections import Counter, defaultdict
+import numpy as np
+from pipeline_io import iter_records
+from skill_gazetteer import tokenize
+
+# Keyword retrieval next to the dense MiniLM search. Each index is a directory of .npy
+# arrays opened with mmap_mode="r":
+#   terms.npy      sorted vocabulary (looked up with searchsorted, no dict to build)
+#   offsets.npy    start of each term's postings, len(terms) + 1
+#   docs.npy       doc-id gaps within each posting list (delta-encoded, smallest dtype)
+#   tfs.npy        term frequency per posting
+#   doc_len.npy    tokens per document
+#   doc_ids.json   external id of each document (resume_id / job_id)
+RESUME_BM25_DIR = "resume_text.bm25"
+JOB_BM25_DIR = "job_text.bm25"
+RESUME_TEXT_FILE = "steps1_raw_text.json"
+JOB_TEXT_FILE = "job_description_chunks.json"
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+MAX_QUERY_TERMS = 64
+RRF_K = 60
+RRF_DEPTH = 100
+
+STOP_WORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "have", "in",
+    "is", "it", "of", "on", "or", "our", "that", "the", "this", "to", "we", "will", "with",
+    "you", "your"
+}
+
+
+def terms_of(text):
+    return [t for t in tokenize(text or "") if t not in STOP_WORDS and not t.isdigit()]
+
+
+def build_bm25(docs, out_dir):
+    # docs: iterable of (external_id, text); several docs may share an id (job chunks)
+    started = time.perf_counter()
+    postings = defaultdict(list)
+    doc_ids = []
+    doc_len = []
+
+    for doc, (external_id, text) in enumerate(docs):
+        counts = Counter(terms_of(text))
+        doc_ids.append(str(external_id))
+        doc_len.append(sum(counts.values()))
+        for term, tf in counts.items():
+            postings[term].append((doc, tf))
+
+    terms = sorted(postings)
+    offsets = np.zeros(len(terms) + 1, dtype="int64")
+    gaps, tfs = [], []
+    for i, term in enumerate(terms):
+        previous = 0
+        for doc, tf in postings[term]:
+            gaps.append(doc - previous)
+            tfs.append(min(tf, 65535))
+            previous = doc
+        offsets[i + 1] = len(gaps)
+
+    gaps = np.asarray(gaps, dtype="int64")
+    gaps = gaps.astype(np.min_scalar_type(int(gaps.max()) if len(gaps) else 0))
+
+    os.makedirs(out_dir, exist_ok=True)
+    np.save(os.path.join(out_dir, "terms.npy"), np.asarray(terms, dtype=str))
+    np.save(os.path.join(out_dir, "offsets.npy"), offsets)
+    np.save(os.path.join(out_dir, "docs.npy"), gaps)
+    np.save(os.path.join(out_dir, "tfs.npy"), np.asarray(tfs, dtype="uint16"))
+    np.save(os.path.join(out_dir, "doc_len.npy"), np.asarray(doc_len, dtype="float32"))
+    with open(os.path.join(out_dir, "doc_ids.json"), "w", encoding="utf-8") as f:
+        json.dump(doc_ids, f, ensure_ascii=False)
+
+    size = sum(os.path.getsize(os.path.join(out_dir, n)) for n in os.listdir(out_dir))
+    print(f"BM25 index saved: {out_dir} ({len(doc_ids)} docs, {len(terms)} terms, "
+          f"{len(gaps)} postings, {size / 1e6:.1f} MB, {time.perf_counter() - started:.1f}s)")
+
+
+class BM25Index:
+
+    def __init__(self, directory):
+        def load(name):
+            return np.load(os.path.join(directory, name), mmap_mode="r")
+
+        self.terms = load("terms.npy")
+        self.offsets = load("offsets.npy")
+        self.docs = load("docs.npy")
+        self.tfs = load("tfs.npy")
+        self.doc_len = load("doc_len.npy")
+        with open(os.path.join(directory, "doc_ids.json"), "r", encoding="utf-8") as f:
+            self.doc_ids = json.load(f)
+
+        self.count = len(self.doc_ids)
+        self.avg_len = float(np.mean(self.doc_len)) if self.count else 0.0
+
+    def term_slice(self, term):
+        i = int(np.searchsorted(self.terms, term))
+        if i < len(self.terms) and self.terms[i] == term:
+            return int(self.offsets[i]), int(self.offsets[i + 1])
+        return None
+
+    def scores(self, text):
+        found = []
+        for term in set(terms_of(text)):
+            span = self.term_slice(term)
+            if span:
+                found.append(span)
+
+        # Long queries (a whole resume) keep only their rarest terms
+        found.sort(key=lambda span: span[1] - span[0])
+        found = found[:MAX_QUERY_TERMS]
+
+        scores = np.zeros(self.count, dtype="float32")
+        for start, end in found:
+            df = end - start
+            idf = np.log(1 + (self.count - df + 0.5) / (df + 0.5))
+            docs = np.cumsum(self.docs[start:end], dtype="int64")
+            tf = self.tfs[start:end].astype("float32")
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_len[docs] / self.avg_len)
+            scores[docs] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return scores
+
+    def search(self, text, k=RRF_DEPTH):
+        # Best document per external id, highest first: [(external_id, score)]
+        scores = self.scores(text)
+        hits = np.flatnonzero(scores > 0)
+        hits = hits[np.argsort(-scores[hits], kind="stable")]
+
+        best = {}
+        for doc in hits:
+            external_id = self.doc_ids[doc]
+            if external_id not in best:
+                best[external_id] = float(scores[doc])
+                if len(best) >= k:
+                    break
+        return list(best.items())
+
+
+def fuse_rrf(*rankings, k=RRF_K):
+    # Reciprocal rank fusion of id lists, best first
+    fused = defaultdict(float)
+    for ranking in rankings:
+        for rank, item in enumerate(ranking):
+            fused[item] += 1.0 / (k + rank + 1)
+    return sorted(fused.items(), key=lambda x: x[1], reverse=True)
+
+
+_indexes = {}
+
+
+def load_bm25(directory):
+    # None when the index has not been built, so callers fall back to dense-only search
+    if directory not in _indexes:
+        _indexes[directory] = BM25Index(directory) if os.path.exists(directory) else None
+    return _indexes[directory]
+
+
+def resume_docs(path=RESUME_TEXT_FILE):
+    for r in iter_records(path):
+        yield r.get("resume_id"), r.get("raw_text", "")
+
+
+def job_docs(path=JOB_TEXT_FILE):
+    for chunk in iter_records(path):
+        yield chunk.get("job_id"), chunk.get("text", "")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or query the BM25 keyword indexes")
+    parser.add_argument("--build", action="store_true", help="rebuild both indexes")
+    parser.add_argument("--query", help="keyword query to run")
+    parser.add_argument("--corpus", choices=["resumes", "jobs"], default="resumes")
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.build:
+        build_bm25(resume_docs(), RESUME_BM25_DIR)
+        build_bm25(job_docs(), JOB_BM25_DIR)
+
+    if args.query:
+        index = BM25Index(RESUME_BM25_DIR if args.corpus == "resumes" else JOB_BM25_DIR)
+        started = time.perf_counter()
+        hits = index.search(args.query, args.k)
+        elapsed = (time.perf_counter() - started) * 1000
+        for external_id, score in hits:
+            print(f"{score:8.3f}  {external_id}")
+        print(f"{len(hits)} hits in {elapsed:.2f} ms")
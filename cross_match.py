@@ -0,0 +1,199 @@
+import os
+import time
+import argparse
+import numpy as np
+import faiss_index
+from metadata_store import open_store
+
+# Offline job x resume matching. Both corpora share the MiniLM space, so one blocked pass
+# over job-chunk x resume-chunk similarities, reduced to job_id x resume_id (best chunk
+# pair), yields top-K tables in both directions. Known jobs and resumes are then answered
+# by a lookup instead of an encode + search.
+JOB_INDEX_FILE = "rag_vector_index.faiss"
+JOB_METADATA_FILE = "job_description_chunks_metadata.json"
+RESUME_INDEX_FILE = "resume_faiss.index"
+RESUME_METADATA_FILE = "resume_metadata.json"
+CROSS_MATCH_FILE = "cross_match_topk.npz"
+
+TOP_K = 50
+JOB_BLOCK_GROUPS = 256
+RESUME_BLOCK_CHUNKS = 16384
+
+
+def _grouped_vectors(index_file, metadata_file, group_key):
+    store = open_store(index_file, metadata_file, group_key)
+    vectors = faiss_index.corpus_vectors(faiss_index.read_index(index_file))
+    if vectors is None:
+        raise RuntimeError(f"{index_file} cannot reconstruct its vectors")
+
+    # Rows tombstoned by an incremental update are left out
+    live = ~np.asarray(store.attributes()["deleted"], dtype=bool)
+    vectors = vectors[live]
+    labels, codes = np.unique(np.asarray(store.all_group_ids(), dtype=str)[live], return_inverse=True)
+    order = np.argsort(codes, kind="stable")
+    # starts[g] is the first row of group g once rows are sorted by group
+    starts = np.searchsorted(codes[order], np.arange(len(labels) + 1))
+    return labels, vectors[order], starts
+
+
+def _merge_topk(scores, ids, new_scores, new_ids, k):
+    scores = np.concatenate([scores, new_scores], axis=1)
+    ids = np.concatenate([ids, new_ids], axis=1)
+    keep = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return np.take_along_axis(scores, keep, axis=1), np.take_along_axis(ids, keep, axis=1)
+
+
+def _sorted_topk(scores, ids):
+    order = np.argsort(-scores, axis=1, kind="stable")
+    return np.take_along_axis(scores, order, axis=1), np.take_along_axis(ids, order, axis=1)
+
+
+def _resume_blocks(starts, block_chunks):
+    # Blocks end on group boundaries so no resume is split across two blocks
+    g = 0
+    groups = len(starts) - 1
+    while g < groups:
+        end = int(np.searchsorted(starts, starts[g] + block_chunks, side="right")) - 1
+        end = min(max(end, g + 1), groups)
+        yield g, end
+        g = end
+
+
+def build_cross_match(k=TOP_K, job_block=JOB_BLOCK_GROUPS, resume_block=RESUME_BLOCK_CHUNKS,
+                      output_file=CROSS_MATCH_FILE):
+    started = time.perf_counter()
+    job_ids, job_vectors, job_starts = _grouped_vectors(JOB_INDEX_FILE, JOB_METADATA_FILE, "job_id")
+    resume_ids, resume_vectors, resume_starts = _grouped_vectors(
+        RESUME_INDEX_FILE, RESUME_METADATA_FILE, "resume_id"
+    )
+    n_jobs, n_resumes = len(job_ids), len(resume_ids)
+    print(f"Cross-matching {n_jobs} jobs ({len(job_vectors)} chunks) x "
+          f"{n_resumes} resumes ({len(resume_vectors)} chunks)")
+
+    # Running top-K in both directions; -1 / -inf mark unfilled slots
+    job_scores = np.full((n_jobs, k), -np.inf, dtype="float32")
+    job_top = np.full((n_jobs, k), -1, dtype="int32")
+    resume_scores = np.full((n_resumes, k), -np.inf, dtype="float32")
+    resume_top = np.full((n_resumes, k), -1, dtype="int32")
+    resume_blocks = list(_resume_blocks(resume_starts, resume_block))
+
+    for j0 in range(0, n_jobs, job_block):
+        j1 = min(j0 + job_block, n_jobs)
+        jobs = job_vectors[job_starts[j0]:job_starts[j1]]
+        job_rows = job_starts[j0:j1] - job_starts[j0]
+        job_range = np.arange(j0, j1, dtype="int32")
+
+        for r0, r1 in resume_blocks:
+            sims = jobs @ resume_vectors[resume_starts[r0]:resume_starts[r1]].T
+
+            # Best chunk pair per (job, resume): reduce rows by job, then columns by resume
+            sims = np.maximum.reduceat(sims, job_rows, axis=0)
+            sims = np.maximum.reduceat(sims, resume_starts[r0:r1] - resume_starts[r0], axis=1)
+
+            job_scores[j0:j1], job_top[j0:j1] = _merge_topk(
+                job_scores[j0:j1], job_top[j0:j1],
+                sims, np.broadcast_to(np.arange(r0, r1, dtype="int32"), sims.shape), k
+            )
+            resume_scores[r0:r1], resume_top[r0:r1] = _merge_topk(
+                resume_scores[r0:r1], resume_top[r0:r1],
+                sims.T, np.broadcast_to(job_range, sims.T.shape), k
+            )
+
+        print(f"Matched jobs {j1}/{n_jobs}")
+
+    job_scores, job_top = _sorted_topk(job_scores, job_top)
+    resume_scores, resume_top = _sorted_topk(resume_scores, resume_top)
+
+    tmp_path = output_file + ".tmp.npz"
+    np.savez(
+        tmp_path,
+        job_ids=job_ids, resume_ids=resume_ids,
+        job_top=job_top, job_scores=job_scores.astype("float16"),
+        resume_top=resume_top, resume_scores=resume_scores.astype("float16"),
+        built=np.asarray(time.time())
+    )
+    os.replace(tmp_path, output_file)
+    print(f"Cross-match tables saved: {output_file} (top {k}, "
+          f"{time.perf_counter() - started:.1f}s)")
+
+
+class CrossMatch:
+
+    def __init__(self, path=CROSS_MATCH_FILE):
+        with np.load(path) as arrays:
+            self.job_ids = arrays["job_ids"]
+            self.resume_ids = arrays["resume_ids"]
+            self.job_top = arrays["job_top"]
+            self.job_scores = arrays["job_scores"]
+            self.resume_top = arrays["resume_top"]
+            self.resume_scores = arrays["resume_scores"]
+            self.built = float(arrays["built"])
+
+        self.job_rows = {j: i for i, j in enumerate(self.job_ids.tolist())}
+        self.resume_rows = {r: i for i, r in enumerate(self.resume_ids.tolist())}
+
+    @staticmethod
+    def _row(top, scores, labels, row, n):
+        return [(str(labels[i]), float(s)) for i, s in zip(top[row][:n], scores[row][:n]) if i >= 0]
+
+    def best_resumes(self, job_id, n=TOP_K):
+        row = self.job_rows.get(job_id)
+        if row is None:
+            return None
+        return self._row(self.job_top, self.job_scores, self.resume_ids, row, n)
+
+    def best_jobs(self, resume_id, n=TOP_K):
+        row = self.resume_rows.get(resume_id)
+        if row is None:
+            return None
+        return self._row(self.resume_top, self.resume_scores, self.job_ids, row, n)
+
+
+_cross_match = None
+_cross_match_mtimes = None
+
+
+def _mtime(path):
+    return os.path.getmtime(path) if os.path.exists(path) else None
+
+
+def load_cross_match(path=CROSS_MATCH_FILE):
+    # None when the tables have not been built or predate either index. The loaded tables
+    # are reused until the file or either index changes on disk.
+    global _cross_match, _cross_match_mtimes
+    built, job_index, resume_index = mtimes = (_mtime(path), _mtime(JOB_INDEX_FILE), _mtime(RESUME_INDEX_FILE))
+    if (path, mtimes) == _cross_match_mtimes:
+        return _cross_match
+
+    tables = None
+    if built is not None:
+        if built < max(t for t in (job_index, resume_index, 0) if t is not None):
+            print(f"{path} is older than the indexes, rebuild with: python cross_match.py --build")
+        else:
+            tables = CrossMatch(path)
+
+    _cross_match, _cross_match_mtimes = tables, (path, mtimes)
+    return tables
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or query the job x resume top-K tables")
+    parser.add_argument("--build", action="store_true")
+    parser.add_argument("--k", type=int, default=TOP_K)
+    parser.add_argument("--job", help="best resumes for this job_id")
+    parser.add_argument("--resume", help="best jobs for this resume_id")
+    parser.add_argument("--n", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.build:
+        build_cross_match(args.k)
+
+    if args.job or args.resume:
+        tables = load_cross_match()
+        if tables is None:
+            raise SystemExit(f"{CROSS_MATCH_FILE} missing or stale, run with --build first")
+        hits = tables.best_resumes(args.job, args.n) if args.job else tables.best_jobs(args.resume, args.n)
+        if hits is None:
+            raise SystemExit(f"Unknown id: {args.job or args.resume}")
+        for label, score in hits:
+            print(f"{score:.4f}  {label}")
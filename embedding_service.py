@@ -0,0 +1,436 @@
+import os
+import hashlib
+import argparse
+import threading
+from contextlib import contextmanager
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+# One MiniLM per process, shared by the index builders, the CLI search tools and the API
+HF_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+VECTOR_SIZE = 384
+MAX_TOKENS = 256
+EMBED_BATCH_SIZE = 64
+
+# Vectors are appended to <slug>.f32 (read back through a memmap); <slug>.keys holds
+# one text hash per row in the same order. Writers in every process hold <slug>.lock.
+EMBED_CACHE_DIR = os.getenv("EMBED_CACHE_DIR", "embedding_cache")
+EMBED_CACHE_BYPASS = os.getenv("EMBED_CACHE_BYPASS", "") == "1"
+
+# "torch" runs the HF model eagerly in fp32; "onnx" runs the exported, int8-quantized
+# graph through ONNX Runtime on CPU (build it once with --export-onnx)
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "torch")
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "onnx_minilm")
+ONNX_MODEL_FILE = "model.int8.onnx"
+ONNX_THREADS = int(os.getenv("ONNX_THREADS", "0"))
+PARITY_MIN_COSINE = 0.99
+PARITY_CORPORA = ["resume_metadata.json", "job_description_chunks_metadata.json"]
+
+stats = {"hits": 0, "misses": 0}
+
+_models = {}
+_model_lock = threading.Lock()
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def set_backend(backend):
+    global EMBED_BACKEND, _cache
+    if backend not in ("torch", "onnx"):
+        raise ValueError(f"Unknown embedding backend: {backend}")
+    with _cache_lock:
+        EMBED_BACKEND = backend
+        _cache = None
+
+
+def _load_torch():
+    import torch
+    from transformers import AutoTokenizer, AutoModel
+
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    tokenizer = AutoTokenizer.from_pretrained(HF_MODEL_NAME)
+    model = AutoModel.from_pretrained(HF_MODEL_NAME).to(device)
+    model.eval()
+    print(f"Embedding model loaded: {HF_MODEL_NAME} on {device}")
+    return tokenizer, model, device
+
+
+def _load_onnx():
+    import onnxruntime as ort
+    from transformers import AutoTokenizer
+
+    model_path = os.path.join(ONNX_MODEL_DIR, ONNX_MODEL_FILE)
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(
+            f"{model_path} not found, run: python embedding_service.py --export-onnx"
+        )
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.intra_op_num_threads = ONNX_THREADS or max((os.cpu_count() or 2) // 2, 1)
+    options.inter_op_num_threads = 1
+
+    tokenizer = AutoTokenizer.from_pretrained(ONNX_MODEL_DIR)
+    session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+    print(f"Embedding model loaded: {model_path} (ONNX Runtime, "
+          f"{options.intra_op_num_threads} intra-op threads)")
+    return tokenizer, session, "cpu"
+
+
+def _load_model(backend=None):
+    backend = backend or EMBED_BACKEND
+    with _model_lock:
+        if backend not in _models:
+            _models[backend] = _load_onnx() if backend == "onnx" else _load_torch()
+    return _models[backend]
+
+
+def _prewarm(backend):
+    try:
+        _load_model(backend)
+    except Exception as e:
+        print(f"Embedding model prewarm failed, will retry on first use: {e}")
+
+
+def prewarm(backend=None):
+    # Load the model on a background thread so it is ready by the time a query arrives
+    thread = threading.Thread(target=_prewarm, args=(backend,), daemon=True)
+    thread.start()
+    return thread
+
+
+def _embed_batch_torch(texts):
+    import torch
+
+    tokenizer, model, device = _load_model("torch")
+    encoded = tokenizer(
+        texts, truncation=True, padding=True,
+        max_length=MAX_TOKENS, return_tensors="pt"
+    ).to(device)
+
+    with torch.no_grad():
+        output = model(**encoded)
+
+    mask = encoded["attention_mask"].unsqueeze(-1).float()
+    pooled = (output.last_hidden_state * mask).sum(1) / mask.sum(1).clamp(min=1e-9)
+    pooled = torch.nn.functional.normalize(pooled, p=2, dim=1)
+    return pooled.cpu().numpy().astype("float32")
+
+
+def _embed_batch_onnx(texts):
+    tokenizer, session, _ = _load_model("onnx")
+    encoded = tokenizer(
+        texts, truncation=True, padding=True,
+        max_length=MAX_TOKENS, return_tensors="np"
+    )
+    feeds = {i.name: encoded[i.name].astype("int64") for i in session.get_inputs()}
+    hidden = session.run(None, feeds)[0]
+
+    mask = encoded["attention_mask"][..., None].astype("float32")
+    pooled = (hidden * mask).sum(1) / np.clip(mask.sum(1), 1e-9, None)
+    norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+    return (pooled / np.clip(norms, 1e-12, None)).astype("float32")
+
+
+def _embed_batch(texts, backend=None):
+    if (backend or EMBED_BACKEND) == "onnx":
+        return _embed_batch_onnx(texts)
+    return _embed_batch_torch(texts)
+
+
+def embed_uncached(texts, batch_size=EMBED_BATCH_SIZE, backend=None):
+    vectors = np.empty((len(texts), VECTOR_SIZE), dtype="float32")
+    if not texts:
+        return vectors
+
+    # Bucket by token length so every batch pads to roughly the same length
+    tokenizer, _, _ = _load_model(backend)
+    lengths = [len(ids) for ids in tokenizer(texts, truncation=True, max_length=MAX_TOKENS)["input_ids"]]
+    order = np.argsort(lengths, kind="stable")
+
+    for start in range(0, len(order), batch_size):
+        rows = order[start:start + batch_size]
+        vectors[rows] = _embed_batch([texts[i] for i in rows], backend)
+
+    return vectors
+
+
+def model_slug():
+    # int8 vectors differ slightly from fp32 ones, so each backend keeps its own cache
+    slug = HF_MODEL_NAME.replace("/", "__")
+    return slug if EMBED_BACKEND == "torch" else f"{slug}__onnx-int8"
+
+
+def text_key(text):
+    return hashlib.sha256(f"{MAX_TOKENS}\n{text}".encode("utf-8")).hexdigest()
+
+
+@contextmanager
+def _file_lock(path):
+    # Exclusive lock shared by every process using the same cache directory
+    with open(path, "a+b") as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class EmbeddingCache:
+
+    def __init__(self, directory, slug):
+        self.vectors_path = os.path.join(directory, slug + ".f32")
+        self.keys_path = os.path.join(directory, slug + ".keys")
+        self.lock_path = os.path.join(directory, slug + ".lock")
+        self.row_bytes = VECTOR_SIZE * 4
+        self.rows = {}
+        self.count = 0
+        self._memmap = None
+
+        if os.path.exists(self.keys_path) and os.path.exists(self.vectors_path):
+            with _file_lock(self.lock_path):
+                self._load()
+
+    def _load(self):
+        # Called with the file lock held, so no other process is mid-append
+        if not os.path.exists(self.keys_path) or not os.path.exists(self.vectors_path):
+            return
+        with open(self.keys_path, "r", encoding="utf-8") as f:
+            keys = [line.strip() for line in f if len(line.strip()) == 64]
+
+        # An interrupted append can leave one file a row ahead of the other
+        count = min(len(keys), os.path.getsize(self.vectors_path) // self.row_bytes)
+        self._truncate(count, len(keys))
+        self.rows = {}
+        for i, key in enumerate(keys[:count]):
+            self.rows.setdefault(key, i)
+        self.count = count
+        self._memmap = None
+
+    def _truncate(self, count, key_count):
+        if os.path.getsize(self.vectors_path) != count * self.row_bytes:
+            with open(self.vectors_path, "r+b") as f:
+                f.truncate(count * self.row_bytes)
+        if key_count != count:
+            with open(self.keys_path, "r", encoding="utf-8") as f:
+                lines = f.readlines()[:count]
+            with open(self.keys_path, "w", encoding="utf-8") as f:
+                f.writelines(lines)
+
+    def _vectors(self):
+        if self._memmap is None and self.count:
+            self._memmap = np.memmap(self.vectors_path, dtype="float32", mode="r",
+                                     shape=(self.count, VECTOR_SIZE))
+        return self._memmap
+
+    def get(self, keys):
+        found = {}
+        vectors = self._vectors()
+        for key in keys:
+            row = self.rows.get(key)
+            if row is not None:
+                found[key] = np.array(vectors[row])
+        return found
+
+    def add(self, keys, vectors):
+        os.makedirs(os.path.dirname(self.vectors_path) or ".", exist_ok=True)
+
+        with _file_lock(self.lock_path):
+            # Other processes may have appended since this one last looked: row numbers
+            # come from the files, not from what this process has seen
+            if not os.path.exists(self.vectors_path) or \
+                    os.path.getsize(self.vectors_path) != self.count * self.row_bytes:
+                self._load()
+
+            new = list({k: v for k, v in zip(keys, vectors) if k not in self.rows}.items())
+            if not new:
+                return
+
+            # Vectors first: a key line never points past the end of the vector file
+            with open(self.vectors_path, "ab") as f:
+                f.write(np.asarray([v for _, v in new], dtype="float32").tobytes())
+            with open(self.keys_path, "a", encoding="utf-8") as f:
+                f.write("".join(k + "\n" for k, _ in new))
+
+            for key, _ in new:
+                self.rows[key] = self.count
+                self.count += 1
+            self._memmap = None
+
+    def size_bytes(self):
+        return self.count * self.row_bytes
+
+
+def _get_cache():
+    global _cache
+    if _cache is None:
+        _cache = EmbeddingCache(EMBED_CACHE_DIR, model_slug())
+    return _cache
+
+
+def encode(texts, batch_size=EMBED_BATCH_SIZE, use_cache=True):
+    texts = list(texts)
+    if not use_cache or EMBED_CACHE_BYPASS:
+        return embed_uncached(texts, batch_size)
+
+    keys = [text_key(t) for t in texts]
+    with _cache_lock:
+        cache = _get_cache()
+        found = cache.get(set(keys))
+
+    missing = list(dict.fromkeys(k for k in keys if k not in found))
+    stats["hits"] += len(texts) - sum(1 for k in keys if k not in found)
+    stats["misses"] += len(missing)
+
+    if missing:
+        first_text = {}
+        for key, text in zip(keys, texts):
+            first_text.setdefault(key, text)
+        fresh = embed_uncached([first_text[k] for k in missing], batch_size)
+        with _cache_lock:
+            cache.add(missing, fresh)
+        found.update(zip(missing, fresh))
+
+    vectors = np.empty((len(texts), VECTOR_SIZE), dtype="float32")
+    for i, key in enumerate(keys):
+        vectors[i] = found[key]
+    return vectors
+
+
+def encode_one(text, use_cache=True):
+    return encode([text], use_cache=use_cache)
+
+
+def summary():
+    total = stats["hits"] + stats["misses"]
+    ratio = stats["hits"] / total if total else 0.0
+    return (f"Embedding cache: {stats['hits']} hits, {stats['misses']} embedded "
+            f"({ratio:.0%} hit ratio)")
+
+
+def export_onnx(output_dir=ONNX_MODEL_DIR):
+    import torch
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    tokenizer, model, _ = _load_model("torch")
+    model = model.to("cpu")
+    os.makedirs(output_dir, exist_ok=True)
+
+    fp32_path = os.path.join(output_dir, "model.onnx")
+    sample = tokenizer(["a short sample", "a somewhat longer sample sentence"],
+                       padding=True, return_tensors="pt")
+    names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in sample]
+    dynamic = {n: {0: "batch", 1: "sequence"} for n in names}
+    dynamic["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    torch.onnx.export(
+        model, tuple(sample[n] for n in names), fp32_path,
+        input_names=names, output_names=["last_hidden_state"],
+        dynamic_axes=dynamic, opset_version=17
+    )
+
+    int8_path = os.path.join(output_dir, ONNX_MODEL_FILE)
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+    tokenizer.save_pretrained(output_dir)
+
+    print(f"Exported {fp32_path} ({os.path.getsize(fp32_path) / 1e6:.1f} MB) and "
+          f"{int8_path} ({os.path.getsize(int8_path) / 1e6:.1f} MB)")
+
+
+def _corpus_texts(paths=PARITY_CORPORA, limit=0):
+    import json
+
+    texts = []
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            texts.extend(entry.get("text", "") for entry in json.load(f) if entry.get("text"))
+    return texts[:limit] if limit else texts
+
+
+def parity(limit=0, paths=PARITY_CORPORA):
+    texts = _corpus_texts(paths, limit)
+    reference = embed_uncached(texts, backend="torch")
+    candidate = embed_uncached(texts, backend="onnx")
+
+    # Both sides are L2-normalized, so the row-wise dot product is the cosine
+    cosines = (reference * candidate).sum(axis=1)
+    worst = int(np.argmin(cosines))
+    ok = cosines.min() >= PARITY_MIN_COSINE
+
+    print(f"Parity over {len(texts)} stored chunks: mean cosine {cosines.mean():.4f}, "
+          f"min {cosines.min():.4f} (row {worst}), threshold {PARITY_MIN_COSINE}")
+    print("PASS" if ok else "FAIL")
+    return ok
+
+
+def benchmark(limit=256, queries=50, batch_size=EMBED_BATCH_SIZE):
+    import time
+
+    texts = _corpus_texts(limit=limit)
+    for backend in ("torch", "onnx"):
+        _load_model(backend)
+        embed_uncached(texts[:8], batch_size, backend)
+
+        latencies = []
+        for text in texts[:queries]:
+            started = time.perf_counter()
+            _embed_batch([text], backend)
+            latencies.append((time.perf_counter() - started) * 1000)
+        latencies.sort()
+
+        started = time.perf_counter()
+        embed_uncached(texts, batch_size, backend)
+        elapsed = time.perf_counter() - started
+
+        print(f"{backend:5}: single query p50 {latencies[len(latencies) // 2]:.1f} ms, "
+              f"p95 {latencies[int(len(latencies) * 0.95)]:.1f} ms | "
+              f"{len(texts) / elapsed:.1f} chunks/sec at batch size {batch_size}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect the embedding cache and backends")
+    parser.add_argument("--backend", choices=["torch", "onnx"], default=EMBED_BACKEND)
+    parser.add_argument("--clear", action="store_true", help="delete the cached vectors for this model")
+    parser.add_argument("--embed", help="print the first values of the vector for a piece of text")
+    parser.add_argument("--export-onnx", action="store_true",
+                        help=f"export MiniLM to ONNX and quantize it to int8 in {ONNX_MODEL_DIR}/")
+    parser.add_argument("--parity", action="store_true",
+                        help="compare ONNX against PyTorch vectors on the stored corpora")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="single-query latency and batch throughput for both backends")
+    parser.add_argument("--limit", type=int, default=0, help="corpus chunks for --parity/--benchmark")
+    args = parser.parse_args()
+
+    set_backend(args.backend)
+    cache = _get_cache()
+    if args.export_onnx:
+        export_onnx()
+    elif args.parity:
+        raise SystemExit(0 if parity(args.limit) else 1)
+    elif args.benchmark:
+        benchmark(args.limit or 256)
+    elif args.clear:
+        for path in (cache.vectors_path, cache.keys_path):
+            if os.path.exists(path):
+                os.remove(path)
+        print("Embedding cache cleared")
+    elif args.embed:
+        print(encode_one(args.embed)[0][:8])
+    else:
+        print(f"{HF_MODEL_NAME}: {len(cache.rows)} cached vectors "
+              f"({cache.size_bytes() / 1e6:.1f} MB) in {EMBED_CACHE_DIR}")
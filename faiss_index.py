@@ -0,0 +1,298 @@
+import os
+import time
+import hashlib
+import argparse
+import faiss
+import numpy as np
+
+# Index types for the resume and job-chunk corpora. All of them score by inner product
+# on L2-normalized vectors (cosine), like the original IndexFlatIP.
+INDEX_TYPES = ["flat", "ivf-flat", "ivf-pq", "hnsw"]
+DEFAULT_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "flat")
+
+DEFAULT_NPROBE = 8
+DEFAULT_PQ_M = 48
+DEFAULT_PQ_BITS = 8
+DEFAULT_HNSW_M = 32
+DEFAULT_EF_CONSTRUCTION = 200
+DEFAULT_EF_SEARCH = 64
+MIN_POINTS_PER_CENTROID = 39
+TRAIN_POINTS_PER_CENTROID = 256
+RANDOM_SEED = 1234
+
+# Grouped search: how chunk scores combine into one score per resume/job, and how far
+# to over-fetch before giving up on finding N distinct groups
+GROUP_COMBINE = "max"
+GROUP_TOP_CHUNKS = 3
+GROUP_OVERFETCH = 4
+GROUP_SEARCH_BUDGET = 2000
+
+# Search-time overrides applied to every index opened through read_index()
+FAISS_NPROBE = int(os.getenv("FAISS_NPROBE", "0"))
+FAISS_EF_SEARCH = int(os.getenv("FAISS_EF_SEARCH", "0"))
+
+
+def default_nlist(n):
+    # ~4*sqrt(n) lists, but never so many that a list gets fewer than 39 training points
+    return max(1, min(int(4 * np.sqrt(n)), n // MIN_POINTS_PER_CENTROID))
+
+
+def factory_string(index_type, n, nlist=0, pq_m=DEFAULT_PQ_M, pq_bits=DEFAULT_PQ_BITS,
+                   hnsw_m=DEFAULT_HNSW_M):
+    if index_type == "flat":
+        return "Flat"
+    if index_type == "hnsw":
+        return f"HNSW{hnsw_m}"
+
+    nlist = nlist or default_nlist(n)
+    if index_type == "ivf-flat":
+        return f"IVF{nlist},Flat"
+    if index_type == "ivf-pq":
+        return f"IVF{nlist},PQ{pq_m}x{pq_bits}"
+    raise ValueError(f"Unknown index type: {index_type}")
+
+
+def min_training_points(index_type, nlist, pq_bits=DEFAULT_PQ_BITS):
+    if index_type == "ivf-flat":
+        return nlist * MIN_POINTS_PER_CENTROID
+    if index_type == "ivf-pq":
+        return max(nlist * MIN_POINTS_PER_CENTROID, (1 << pq_bits) * MIN_POINTS_PER_CENTROID)
+    return 0
+
+
+def sample_training_set(vectors, size, seed=RANDOM_SEED):
+    if size <= 0 or size >= len(vectors):
+        return vectors
+    rows = np.random.default_rng(seed).choice(len(vectors), size, replace=False)
+    return vectors[np.sort(rows)]
+
+
+def set_search_params(index, nprobe=0, ef_search=0):
+    if nprobe:
+        ivf = faiss.try_extract_index_ivf(index)
+        if ivf is not None:
+            ivf.nprobe = nprobe
+    if ef_search and hasattr(faiss.downcast_index(index), "hnsw"):
+        faiss.downcast_index(index).hnsw.efSearch = ef_search
+    return index
+
+
+def stable_id(*parts):
+    # 63-bit label derived from the parts, identical on every build and valid as a FAISS id
+    key = "\x1f".join(str(p) for p in parts).encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little") & 0x7FFFFFFFFFFFFFFF
+
+
+def build_index(vectors, index_type=DEFAULT_INDEX_TYPE, nlist=0, nprobe=DEFAULT_NPROBE,
+                pq_m=DEFAULT_PQ_M, pq_bits=DEFAULT_PQ_BITS, hnsw_m=DEFAULT_HNSW_M,
+                ef_construction=DEFAULT_EF_CONSTRUCTION, ef_search=DEFAULT_EF_SEARCH,
+                train_sample=0, ids=None):
+    # With ids, the index is wrapped in an IndexIDMap2 so rows can be removed/replaced by id
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    n, dim = vectors.shape
+
+    nlist = nlist or default_nlist(n)
+    needed = min_training_points(index_type, nlist, pq_bits)
+    if n < needed:
+        print(f"Only {n} vectors, {index_type} needs {needed} to train; building a flat index")
+        index_type = "flat"
+
+    spec = factory_string(index_type, n, nlist, pq_m, pq_bits, hnsw_m)
+    index = faiss.index_factory(dim, spec, faiss.METRIC_INNER_PRODUCT)
+
+    if index_type == "hnsw":
+        faiss.downcast_index(index).hnsw.efConstruction = ef_construction
+
+    started = time.perf_counter()
+    if not index.is_trained:
+        size = train_sample or nlist * TRAIN_POINTS_PER_CENTROID
+        training = sample_training_set(vectors, max(size, needed))
+        index.train(training)
+        print(f"Trained {spec} on {len(training)} of {n} vectors")
+
+    set_search_params(index, nprobe, ef_search)
+    if ids is not None:
+        index = faiss.IndexIDMap2(index)
+        index.add_with_ids(vectors, np.asarray(ids, dtype="int64"))
+    else:
+        index.add(vectors)
+    print(f"Built {spec} index with {index.ntotal} vectors in {time.perf_counter() - started:.1f}s")
+    return index
+
+
+def row_index(index):
+    # Searches address vectors by row (= metadata vector_id). An IndexIDMap2 is unwrapped
+    # and kept alive on the inner index; its stable ids are only used for updates.
+    if isinstance(index, faiss.IndexIDMap2):
+        inner = faiss.downcast_index(index.index)
+        inner.referenced_objects = [index]
+        return inner
+    return index
+
+
+def read_index(path):
+    # nprobe/efSearch are stored in the file; the env overrides tune them per deployment
+    return set_search_params(row_index(faiss.read_index(path)), FAISS_NPROBE, FAISS_EF_SEARCH)
+
+
+def combine_scores(scores, combine=GROUP_COMBINE, top_chunks=GROUP_TOP_CHUNKS):
+    if combine == "max":
+        return scores[0]
+    if combine == "sum":
+        return sum(scores[:top_chunks])
+    raise ValueError(f"Unknown score combination: {combine}")
+
+
+def grouped_search(index, vector, n, group_ids, combine=GROUP_COMBINE,
+                   top_chunks=GROUP_TOP_CHUNKS, budget=GROUP_SEARCH_BUDGET,
+                   params=None, available=None):
+    # group_ids(vector_ids) -> {vector_id: group_id}. Fetches n * GROUP_OVERFETCH chunks and
+    # doubles until n distinct groups turn up or the budget / corpus is exhausted.
+    # With a filter in params, `available` is the number of vectors that pass it.
+    limit = min(budget, index.ntotal if available is None else available)
+    if limit <= 0:
+        return []
+    k = min(max(n * GROUP_OVERFETCH, 1), limit)
+
+    while True:
+        scores, ids = index.search(vector, k, params=params)
+        hits = [(int(i), float(s)) for i, s in zip(ids[0], scores[0]) if i >= 0]
+        groups_of = group_ids([i for i, _ in hits])
+
+        groups = {}
+        for vector_id, score in hits:
+            group = groups_of.get(vector_id)
+            if group is not None:
+                groups.setdefault(group, []).append((vector_id, score))
+
+        if len(groups) >= n or k >= limit:
+            break
+        k = min(k * 2, limit)
+
+    # Hits arrive best-first, so each group's chunk list is already sorted by score
+    ranked = [
+        (group, combine_scores([s for _, s in chunks], combine, top_chunks), chunks)
+        for group, chunks in groups.items()
+    ]
+    ranked.sort(key=lambda g: g[1], reverse=True)
+    return ranked[:n]
+
+
+def add_index_arguments(parser):
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default=DEFAULT_INDEX_TYPE)
+    parser.add_argument("--nlist", type=int, default=0, help="IVF lists (0 = about 4*sqrt(n))")
+    parser.add_argument("--nprobe", type=int, default=DEFAULT_NPROBE, help="IVF lists scanned per query")
+    parser.add_argument("--pq-m", type=int, default=DEFAULT_PQ_M, help="PQ sub-quantizers (must divide 384)")
+    parser.add_argument("--pq-bits", type=int, default=DEFAULT_PQ_BITS)
+    parser.add_argument("--hnsw-m", type=int, default=DEFAULT_HNSW_M)
+    parser.add_argument("--ef-construction", type=int, default=DEFAULT_EF_CONSTRUCTION)
+    parser.add_argument("--ef-search", type=int, default=DEFAULT_EF_SEARCH)
+    parser.add_argument("--train-sample", type=int, default=0,
+                        help="vectors sampled for training (0 = 256 per IVF list)")
+
+
+def index_options(args):
+    return {
+        "index_type": args.index_type,
+        "nlist": args.nlist,
+        "nprobe": args.nprobe,
+        "pq_m": args.pq_m,
+        "pq_bits": args.pq_bits,
+        "hnsw_m": args.hnsw_m,
+        "ef_construction": args.ef_construction,
+        "ef_search": args.ef_search,
+        "train_sample": args.train_sample
+    }
+
+
+def corpus_vectors(index):
+    # Every stored vector, for exact whole-corpus scoring; None when the index cannot
+    # reconstruct (it is then only searchable)
+    try:
+        ivf = faiss.try_extract_index_ivf(index)
+        if ivf is not None:
+            ivf.make_direct_map()
+        return index.reconstruct_n(0, index.ntotal)
+    except RuntimeError:
+        return None
+
+
+def load_vectors(path):
+    index = read_index(path)
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def synthetic_vectors(n, dim=384, clusters=200, seed=RANDOM_SEED):
+    # Clustered unit vectors, closer to real embeddings than uniform noise
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype("float32")
+    vectors = centers[rng.integers(0, clusters, n)] + 0.6 * rng.standard_normal((n, dim)).astype("float32")
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def recall_at_k(exact, approx, k):
+    hits = sum(len(set(e[:k]) & set(a[:k]) - {-1}) for e, a in zip(exact, approx))
+    return hits / (len(exact) * k)
+
+
+def benchmark(vectors, index_types, k=10, queries=200, nprobes=(1, 4, 16, 64),
+              ef_searches=(16, 64, 256), **options):
+    rng = np.random.default_rng(RANDOM_SEED)
+    rows = rng.choice(len(vectors), min(queries, len(vectors)), replace=False)
+
+    # Queries are perturbed corpus vectors, so the exact neighbour is not trivially itself
+    query_vectors = vectors[rows] + 0.05 * rng.standard_normal((len(rows), vectors.shape[1])).astype("float32")
+    faiss.normalize_L2(query_vectors)
+
+    flat = build_index(vectors, "flat")
+    started = time.perf_counter()
+    _, exact = flat.search(query_vectors, k)
+    flat_ms = (time.perf_counter() - started) * 1000 / len(rows)
+    print(f"\n{'index':28} {'param':>12} {'recall@' + str(k):>10} {'ms/query':>9}")
+    print(f"{'flat':28} {'-':>12} {1.0:>10.3f} {flat_ms:>9.3f}")
+
+    for index_type in index_types:
+        index = build_index(vectors, index_type, **options)
+        if isinstance(index, faiss.IndexFlat):
+            continue
+
+        if index_type == "hnsw":
+            params = [("efSearch", ef, {"ef_search": ef}) for ef in ef_searches]
+        else:
+            params = [("nprobe", p, {"nprobe": p}) for p in nprobes]
+
+        for name, value, setting in params:
+            set_search_params(index, **setting)
+            started = time.perf_counter()
+            _, approx = index.search(query_vectors, k)
+            ms = (time.perf_counter() - started) * 1000 / len(rows)
+            print(f"{index_type:28} {name + '=' + str(value):>12} "
+                  f"{recall_at_k(exact, approx, k):>10.3f} {ms:>9.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recall@k and latency of ANN index types against flat search")
+    parser.add_argument("--benchmark", metavar="INDEX_FILE",
+                        help="take the corpus vectors from an existing index file")
+    parser.add_argument("--synthetic", type=int, default=0, metavar="N",
+                        help="benchmark on N synthetic clustered vectors instead")
+    parser.add_argument("--types", default="ivf-flat,ivf-pq,hnsw")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    add_index_arguments(parser)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        vectors = synthetic_vectors(args.synthetic)
+    elif args.benchmark:
+        vectors = load_vectors(args.benchmark)
+    else:
+        parser.error("pass --benchmark INDEX_FILE or --synthetic N")
+
+    options = index_options(args)
+    options.pop("index_type")
+    options.pop("nprobe")
+    options.pop("ef_search")
+    print(f"Benchmarking {len(vectors)} vectors of dimension {vectors.shape[1]}")
+    benchmark(vectors, args.types.split(","), args.k, args.queries, **options)
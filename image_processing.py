@@ -7,6 +7,8 @@ import requests
 import numpy as np
 from groq import Groq
 from dotenv import load_dotenv
+from llm_cache import cached_completion
+from skill_gazetteer import MIN_LOCAL_SKILLS, load_matcher
 
 load_dotenv()
 client = Groq(api_key=os.getenv("GROQ_API"))
@@ -47,14 +49,20 @@ def extract_text_from_url(image_url):
     except Exception as e:
         print(" Image processing error:", e)
         return ""
-def extract_skills(text):
+def extract_skills(text, use_gazetteer=True):
+    matcher = load_matcher() if use_gazetteer else None
+    if matcher:
+        skills = matcher.match(text)
+        if len(skills) >= MIN_LOCAL_SKILLS:
+            return skills
+
     try:
-        res = client.chat.completions.create(
+        content = cached_completion(
+            client,
             model="llama-3.3-70b-versatile",
             messages=[{"role": "user", "content": PROMPT + text[:2000]}],
             temperature=0
-        )
-        content = res.choices[0].message.content.strip()
+        ).strip()
         if content.startswith("```"):
             content = re.sub(r'^```(?:json)?\n?', '', content)
             content = re.sub(r'\n?```$', '', content)
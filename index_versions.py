@@ -0,0 +1,143 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import argparse
+
+# Published snapshots of the resume index for the API. Each version is a directory of
+# immutable files plus a version.json with their sizes and checksums; manifest.json names
+# the active version and is replaced atomically, so a reader never sees a half-written
+# version:
+#   index_versions/manifest.json
+#   index_versions/v1760781234567/{resume_faiss.index, resume_metadata.json, ...}
+INDEX_VERSIONS_DIR = os.getenv("INDEX_VERSIONS_DIR", "index_versions")
+MANIFEST_FILE = "manifest.json"
+VERSION_FILE = "version.json"
+KEEP_VERSIONS = 3
+
+RESUME_INDEX_FILES = ["resume_faiss.index", "resume_metadata.json", "resume_faiss.meta.sqlite"]
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_json(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def read_manifest(root=INDEX_VERSIONS_DIR):
+    path = os.path.join(root, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def version_dir(version, root=INDEX_VERSIONS_DIR):
+    return os.path.join(root, version)
+
+
+def verify_version(version, root=INDEX_VERSIONS_DIR):
+    # Raises when a file is missing or differs from what was published
+    directory = version_dir(version, root)
+    with open(os.path.join(directory, VERSION_FILE), "r", encoding="utf-8") as f:
+        info = json.load(f)
+
+    for name, expected in info["files"].items():
+        path = os.path.join(directory, name)
+        if not os.path.exists(path) or os.path.getsize(path) != expected["size"]:
+            raise RuntimeError(f"{version}: {name} is missing or truncated")
+        if _sha256(path) != expected["sha256"]:
+            raise RuntimeError(f"{version}: {name} checksum mismatch")
+    return info
+
+
+def _is_version(name):
+    return name.startswith("v") and name[1:].isdigit()
+
+
+def clear_staging(root=INDEX_VERSIONS_DIR):
+    # vNNN.tmp directories left by a publish that failed part way; publishes run one at
+    # a time (the index builders), so none of them is still being written
+    for name in os.listdir(root):
+        if name.endswith(".tmp") and _is_version(name[:-len(".tmp")]):
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+
+def publish(files=RESUME_INDEX_FILES, root=INDEX_VERSIONS_DIR, keep=KEEP_VERSIONS):
+    # Copies the files into a new version directory, then points the manifest at it
+    os.makedirs(root, exist_ok=True)
+    clear_staging(root)
+    version = f"v{int(time.time() * 1000)}"
+    while os.path.exists(version_dir(version, root)):
+        version = f"v{int(version[1:]) + 1}"
+
+    staging = version_dir(version, root) + ".tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+
+    info = {"version": version, "created": time.time(), "files": {}}
+    for path in files:
+        if not os.path.exists(path):
+            continue
+        target = os.path.join(staging, os.path.basename(path))
+        # copy2 keeps mtimes, so the store is not rebuilt as "older than its JSON"
+        shutil.copy2(path, target)
+        info["files"][os.path.basename(path)] = {"size": os.path.getsize(target), "sha256": _sha256(target)}
+
+    _write_json(os.path.join(staging, VERSION_FILE), info)
+    os.rename(staging, version_dir(version, root))
+
+    previous = read_manifest(root)
+    _write_json(os.path.join(root, MANIFEST_FILE), {
+        "active": version,
+        "previous": previous.get("active") if previous else None,
+        "published": info["created"]
+    })
+    print(f"Published index version {version} to {root}")
+
+    prune(root, keep)
+    return version
+
+
+def prune(root=INDEX_VERSIONS_DIR, keep=KEEP_VERSIONS):
+    # Old versions are removed once `keep` newer ones exist; a server still holding one
+    # keeps working from its open file handles
+    manifest = read_manifest(root) or {}
+    versions = sorted(
+        (name for name in os.listdir(root)
+         if _is_version(name) and os.path.isdir(os.path.join(root, name))),
+        key=lambda name: int(name[1:])
+    )
+    for name in versions[:-keep]:
+        if name != manifest.get("active"):
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Publish the resume index as a new version for the API")
+    parser.add_argument("--publish", action="store_true")
+    parser.add_argument("--show", action="store_true", help="print the manifest and verify the active version")
+    args = parser.parse_args()
+
+    if args.publish:
+        publish()
+
+    if args.show:
+        manifest = read_manifest()
+        if manifest is None:
+            raise SystemExit(f"No {MANIFEST_FILE} in {INDEX_VERSIONS_DIR}")
+        print(json.dumps(manifest, indent=2))
+        verify_version(manifest["active"])
+        print(f"{manifest['active']} verified")
@@ -0,0 +1,190 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import argparse
+import threading
+
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "llm_cache.sqlite")
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "50000"))
+LLM_CACHE_MAX_AGE_DAYS = float(os.getenv("LLM_CACHE_MAX_AGE_DAYS", "90"))
+LLM_CACHE_BYPASS = os.getenv("LLM_CACHE_BYPASS", "") == "1"
+EVICT_EVERY_WRITES = 200
+
+stats = {"hits": 0, "misses": 0, "writes": 0, "evicted": 0}
+
+_conn = None
+_lock = threading.Lock()
+
+
+def _connection():
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(LLM_CACHE_PATH, timeout=30, check_same_thread=False)
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                prompt_hash TEXT,
+                params TEXT,
+                content TEXT,
+                created REAL,
+                last_used REAL,
+                hits INTEGER DEFAULT 0
+            )
+        """)
+        _conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON responses(last_used)")
+        _conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER)")
+        _conn.commit()
+    return _conn
+
+
+def _count(conn, name, amount=1):
+    stats[name] += amount
+    conn.execute(
+        "INSERT INTO counters(name, value) VALUES (?, ?) "
+        "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+        (name, amount)
+    )
+
+
+def request_key(request):
+    messages = json.dumps(request.get("messages", []), sort_keys=True, ensure_ascii=False)
+    prompt_hash = hashlib.sha256(messages.encode("utf-8")).hexdigest()
+
+    params = {k: v for k, v in request.items() if k not in ("model", "messages")}
+    params_json = json.dumps(params, sort_keys=True)
+
+    key = hashlib.sha256(
+        f"{request.get('model')}\n{prompt_hash}\n{params_json}".encode("utf-8")
+    ).hexdigest()
+    return key, prompt_hash, params_json
+
+
+def lookup(request, bypass=False):
+    if bypass or LLM_CACHE_BYPASS:
+        return None
+
+    key, _, _ = request_key(request)
+    now = time.time()
+
+    with _lock:
+        conn = _connection()
+        row = conn.execute(
+            "SELECT content, created FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+
+        if row and now - row[1] <= LLM_CACHE_MAX_AGE_DAYS * 86400:
+            conn.execute(
+                "UPDATE responses SET last_used = ?, hits = hits + 1 WHERE key = ?",
+                (now, key)
+            )
+            _count(conn, "hits")
+            conn.commit()
+            return row[0]
+
+        if row:
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            _count(conn, "evicted")
+        _count(conn, "misses")
+        conn.commit()
+        return None
+
+
+def store(request, content):
+    key, prompt_hash, params_json = request_key(request)
+    now = time.time()
+
+    with _lock:
+        conn = _connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO responses "
+            "(key, model, prompt_hash, params, content, created, last_used, hits) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, 0)",
+            (key, request.get("model"), prompt_hash, params_json, content, now, now)
+        )
+        _count(conn, "writes")
+        conn.commit()
+
+        if stats["writes"] % EVICT_EVERY_WRITES == 0:
+            _evict(conn)
+
+
+def invalidate(request):
+    key, _, _ = request_key(request)
+    with _lock:
+        conn = _connection()
+        conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+        conn.commit()
+
+
+def _evict(conn):
+    cutoff = time.time() - LLM_CACHE_MAX_AGE_DAYS * 86400
+    removed = conn.execute("DELETE FROM responses WHERE created < ?", (cutoff,)).rowcount
+
+    # Size bound: drop the least recently used rows beyond the limit
+    removed += conn.execute(
+        "DELETE FROM responses WHERE key IN ("
+        "SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+        (LLM_CACHE_MAX_ENTRIES,)
+    ).rowcount
+
+    if removed:
+        _count(conn, "evicted", removed)
+    conn.commit()
+    return removed
+
+
+def evict():
+    with _lock:
+        return _evict(_connection())
+
+
+def cached_completion(client, bypass=False, **request):
+    content = lookup(request, bypass)
+    if content is not None:
+        return content
+
+    response = client.chat.completions.create(**request)
+    content = response.choices[0].message.content
+    store(request, content)
+    return content
+
+
+def summary():
+    total = stats["hits"] + stats["misses"]
+    ratio = stats["hits"] / total if total else 0.0
+    return (f"LLM cache: {stats['hits']} hits, {stats['misses']} misses "
+            f"({ratio:.0%} hit ratio), {stats['writes']} writes, {stats['evicted']} evicted")
+
+
+def lifetime_stats():
+    with _lock:
+        conn = _connection()
+        counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+        entries, size = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(content)), 0) FROM responses"
+        ).fetchone()
+    counters["entries"] = entries
+    counters["content_bytes"] = size
+    return counters
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or maintain the LLM response cache")
+    parser.add_argument("--evict", action="store_true", help="apply the age/size limits now")
+    parser.add_argument("--clear", action="store_true", help="drop every cached response")
+    args = parser.parse_args()
+
+    if args.clear:
+        with _lock:
+            conn = _connection()
+            conn.execute("DELETE FROM responses")
+            conn.commit()
+        print("LLM cache cleared")
+    elif args.evict:
+        print(f"Evicted {evict()} entries")
+
+    print(json.dumps(lifetime_stats(), indent=2))
@@ -0,0 +1,130 @@
+import re
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local stand-in for the Groq chat-completions endpoint, for load and retry testing:
+#   python llm_stub_server.py --latency 1.5 --error-rate 0.1
+#   GROQ_BASE_URL=http://127.0.0.1:8765 python Hr_llm_extraction.py --concurrency 16
+
+CHAT_PATH = "/openai/v1/chat/completions"
+
+stats = {"requests": 0, "errors": 0, "max_in_flight": 0}
+in_flight = 0
+stats_lock = threading.Lock()
+
+
+def fake_skills(text):
+    words = re.findall(r"\b[A-Z][A-Za-z+#.]{1,20}\b", text)
+    return list(dict.fromkeys(words))[:15]
+
+
+def fake_answer(prompt, drop_rate):
+    if "### RESUME ID:" not in prompt:
+        return fake_skills(prompt.split("Resume text:")[-1])
+
+    # Batched prompt: answer per id, occasionally "forgetting" one like a real model can
+    answer = {}
+    for section in prompt.split("### RESUME ID: ")[1:]:
+        resume_id, _, text = section.partition("\n")
+        if random.random() >= drop_rate:
+            answer[resume_id.strip()] = fake_skills(text)
+    return answer
+
+
+class ChatCompletionHandler(BaseHTTPRequestHandler):
+    latency = 0.5
+    error_rate = 0.0
+    drop_rate = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        global in_flight
+
+        if self.path != CHAT_PATH:
+            self._send(404, {"error": {"message": "not found"}})
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+
+        with stats_lock:
+            stats["requests"] += 1
+            in_flight += 1
+            stats["max_in_flight"] = max(stats["max_in_flight"], in_flight)
+
+        try:
+            time.sleep(self.latency * random.uniform(0.5, 1.5))
+
+            roll = random.random()
+            if roll < self.error_rate:
+                with stats_lock:
+                    stats["errors"] += 1
+                if roll < self.error_rate / 2:
+                    self._send(429, {"error": {"message": "rate limit exceeded"}},
+                               {"Retry-After": "1"})
+                else:
+                    self._send(503, {"error": {"message": "service unavailable"}})
+                return
+
+            prompt = payload["messages"][-1]["content"]
+            content = json.dumps(fake_answer(prompt, self.drop_rate))
+
+            self._send(200, {
+                "id": f"chatcmpl-stub-{stats['requests']}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": payload.get("model", "stub"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop"
+                }],
+                "usage": {
+                    "prompt_tokens": len(prompt) // 4,
+                    "completion_tokens": len(content) // 4,
+                    "total_tokens": (len(prompt) + len(content)) // 4
+                }
+            })
+        finally:
+            with stats_lock:
+                in_flight -= 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.5, help="mean seconds per response")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="fraction of requests answered with 429/503")
+    parser.add_argument("--drop-rate", type=float, default=0.0,
+                        help="chance of leaving a resume id out of a batched answer")
+    args = parser.parse_args()
+
+    ChatCompletionHandler.latency = args.latency
+    ChatCompletionHandler.error_rate = args.error_rate
+    ChatCompletionHandler.drop_rate = args.drop_rate
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), ChatCompletionHandler)
+    print(f"Stub chat-completions endpoint on http://127.0.0.1:{args.port}{CHAT_PATH}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"Stub stats: {stats}")
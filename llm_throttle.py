@@ -0,0 +1,87 @@
+import time
+import random
+import asyncio
+import groq
+
+CHARS_PER_TOKEN = 4
+COMPLETION_TOKEN_ESTIMATE = 300
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 30.0
+
+
+class TokenBucket:
+
+    def __init__(self, per_minute, capacity=None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount=1):
+        amount = min(amount, self.capacity)
+        # Waiters queue on the lock, so the bucket is drained in arrival order
+        async with self.lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+
+class RateLimiter:
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+    async def acquire(self, tokens):
+        if self.requests:
+            await self.requests.acquire(1)
+        if self.tokens:
+            await self.tokens.acquire(tokens)
+
+
+def estimate_tokens(prompt, completion_tokens=COMPLETION_TOKEN_ESTIMATE):
+    return len(prompt) // CHARS_PER_TOKEN + completion_tokens
+
+
+def is_retryable(exc):
+    if isinstance(exc, groq.APIConnectionError):
+        return True
+    status = getattr(exc, "status_code", None)
+    return status == 429 or (status is not None and status >= 500)
+
+
+def retry_after_seconds(exc):
+    response = getattr(exc, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt):
+    # Full jitter: spread retries so a burst of 429s does not come back in lockstep
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+
+async def call_with_retries(make_call, limiter, tokens, max_retries=5):
+    for attempt in range(max_retries + 1):
+        await limiter.acquire(tokens)
+        try:
+            return await make_call()
+        except Exception as e:
+            if attempt == max_retries or not is_retryable(e):
+                raise
+            delay = retry_after_seconds(e) or backoff_delay(attempt)
+            print(f"LLM call failed ({e}); retry {attempt + 1}/{max_retries} in {delay:.1f}s")
+            await asyncio.sleep(delay)
@@ -0,0 +1,115 @@
+import json
+import time
+import random
+import asyncio
+import argparse
+import numpy as np
+import httpx
+
+# Load test for POST /llm/query: p50/p99 latency and throughput, with and without request
+# micro-batching. By default the app runs in-process (lifespan included) so both modes
+# are measured back to back; --url targets a running server instead (start it with
+# SEARCH_BATCHING=0 or 1 to compare).
+METADATA_FILE = "resume_metadata.json"
+ROLES = ["developer", "engineer", "analyst", "intern", "lead", "consultant", "architect"]
+
+
+def make_queries(count, seed=7, distinct=0):
+    # Queries built from corpus skills, all different unless `distinct` limits them to that
+    # many (repeats are then answered by the API's query caches)
+    with open(METADATA_FILE, "r", encoding="utf-8") as f:
+        skills = sorted({s for e in json.load(f) for s in e.get("metadata", {}).get("skills", [])})
+    rng = random.Random(seed)
+    queries = [
+        f"{rng.choice(ROLES)} with {', '.join(rng.sample(skills, 3))} and {rng.randint(0, 10)} years #{i}"
+        for i in range(distinct or count)
+    ]
+    return [rng.choice(queries) for _ in range(count)] if distinct else queries
+
+
+async def run_load(client, queries, concurrency):
+    # Latencies of answered requests; 503s (shed by admission control) are only counted
+    pending = list(queries)
+    latencies = []
+    shed = []
+
+    async def worker():
+        while pending:
+            query = pending.pop()
+            started = time.perf_counter()
+            response = await client.post("/llm/query", json={"user_type": "hr", "query": query})
+            if response.status_code == 503:
+                shed.append(query)
+            else:
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - started)
+            # In-process, a cached answer completes without ever yielding to the event loop;
+            # yield as a network round trip would, so other requests are not starved
+            await asyncio.sleep(0)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return np.asarray(latencies) * 1000, time.perf_counter() - started, len(shed)
+
+
+def report(label, latencies, elapsed, shed, extra=""):
+    print(f"{label:12} {len(latencies):>6} {shed:>6} {np.percentile(latencies, 50):>9.1f} "
+          f"{np.percentile(latencies, 99):>9.1f} {len(latencies) / elapsed:>9.1f}  {extra}")
+
+
+async def in_process(requests, concurrency, warmup, distinct=0):
+    import embedding_service
+    from app.main import app
+    from app.services import search, vector_service
+
+    # Only the API's own query caches may answer repeats, never the on-disk corpus cache
+    embedding_service.EMBED_CACHE_BYPASS = True
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://load-test", timeout=60) as client:
+            for batching in (False, True):
+                search.SEARCH_BATCHING = batching
+                await run_load(client, make_queries(warmup, seed=1), concurrency)
+                before = dict(search.search_batcher.stats)
+                vector_service.result_cache.clear()
+                hits = vector_service.result_cache.stats["hits"]
+
+                latencies, elapsed, shed = await run_load(
+                    client, make_queries(requests, distinct=distinct), concurrency
+                )
+
+                batches = search.search_batcher.stats["batches"] - before["batches"]
+                items = search.search_batcher.stats["items"] - before["items"]
+                extra = f"mean batch {items / batches:.1f}" if batches else ""
+                if distinct:
+                    extra += f"  cache hits {vector_service.result_cache.stats['hits'] - hits}"
+                report("batched" if batching else "unbatched", latencies, elapsed, shed, extra)
+
+
+async def remote(url, requests, concurrency, warmup, distinct=0):
+    async with httpx.AsyncClient(base_url=url, timeout=60) as client:
+        await run_load(client, make_queries(warmup, seed=1), concurrency)
+        latencies, elapsed, shed = await run_load(client, make_queries(requests, distinct=distinct), concurrency)
+        batcher = (await client.get("/admin/batcher")).json()
+        cache = (await client.get("/admin/cache")).json()["results"]
+        report("server", latencies, elapsed, shed,
+               f"mean batch {batcher['mean']}, cache hit ratio {cache['hit_ratio']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latency/throughput of POST /llm/query")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--distinct", type=int, default=0,
+                        help="draw the requests from this many distinct queries (0 = all different)")
+    parser.add_argument("--url", help="running server, e.g. http://127.0.0.1:8000")
+    args = parser.parse_args()
+
+    print(f"{args.requests} requests, {args.concurrency} concurrent")
+    print(f"{'mode':12} {'ok':>6} {'503':>6} {'p50 ms':>9} {'p99 ms':>9} {'req/s':>9}")
+    if args.url:
+        asyncio.run(remote(args.url, args.requests, args.concurrency, args.warmup, args.distinct))
+    else:
+        asyncio.run(in_process(args.requests, args.concurrency, args.warmup, args.distinct))
@@ -1,7 +1,9 @@
+import time
+
+STARTED = time.perf_counter()
+
 import os
-from groq import Groq
-from Hr_pdf_reading import find_best_employees
-from seeker_resumer_uploader import retrieve_resume_matches
+from llm_cache import cached_completion
 
 LLM_MODEL = "llama-3.3-70b-versatile"
 
@@ -9,7 +11,17 @@ api_key = os.getenv("GROQ_API_KEY")
 if not api_key:
     raise ValueError("GROQ_API_KEY not set")
 
-llm_client = Groq(api_key=api_key)
+# The Groq client and each side's index/model are loaded on first use, so the
+# menu does not wait for either side
+_llm_client = None
+
+
+def get_llm_client():
+    global _llm_client
+    if _llm_client is None:
+        from groq import Groq
+        _llm_client = Groq(api_key=api_key)
+    return _llm_client
 
 def seeker_analysis(job_match):
     metadata = job_match.get("metadata", {})
@@ -52,7 +64,8 @@ Evaluate ONLY:
 Do NOT hallucinate.
 """
 
-    response = llm_client.chat.completions.create(
+    return cached_completion(
+        get_llm_client(),
         model=LLM_MODEL,
         messages=[
             {"role": "system", "content": "You are a strict HR analyst."},
@@ -62,9 +75,9 @@ Do NOT hallucinate.
         max_tokens=350
     )
 
-    return response.choices[0].message.content
-
 def main():
+    print(f"Ready in {time.perf_counter() - STARTED:.2f}s")
+
     while True:
         print("\nWho are you?")
         print("1. Job Seeker")
@@ -78,6 +91,7 @@ def main():
             break
 
         elif choice == "1":
+            from seeker_resumer_uploader import retrieve_resume_matches
             matches = retrieve_resume_matches()
 
             if not matches:
@@ -91,6 +105,7 @@ def main():
                 print(seeker_analysis(match))
 
         elif choice == "2":
+            from Hr_pdf_reading import find_best_employees
             candidates = find_best_employees()
 
             if not candidates:
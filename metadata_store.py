@@ -0,0 +1,180 @@
+import os
+import json
+import sqlite3
+import argparse
+import threading
+
+# Chunk metadata keyed by FAISS row. Opening the store only opens a SQLite file, and a
+# search materializes just the rows it returns. Each distinct "metadata" dict is stored
+# once (normally once per resume/job) instead of once per chunk.
+STORE_VERSION = 3
+
+# Scalar attributes copied into their own columns so search filters can load them as
+# arrays without parsing any JSON. "deleted" marks rows removed by an incremental update
+# whose vectors stay in the index until the next compaction.
+ATTRIBUTE_COLUMNS = ["experience_years", "filename", "company", "location", "deleted"]
+
+
+def store_path(index_path):
+    return os.path.splitext(index_path)[0] + ".meta.sqlite"
+
+
+def write_store(path, entries, group_key):
+    tmp_path = path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    conn = sqlite3.connect(tmp_path)
+    conn.execute("""
+        CREATE TABLE chunks (
+            vector_id INTEGER PRIMARY KEY,
+            stable_id INTEGER,
+            group_id TEXT,
+            doc_id INTEGER,
+            text TEXT,
+            fields TEXT,
+            experience_years REAL,
+            filename TEXT,
+            company TEXT,
+            location TEXT,
+            deleted INTEGER
+        )
+    """)
+    conn.execute("CREATE TABLE documents (doc_id INTEGER PRIMARY KEY, metadata TEXT)")
+    conn.execute("CREATE TABLE info (name TEXT PRIMARY KEY, value TEXT)")
+
+    documents = {}
+    rows = []
+    for vector_id, entry in enumerate(entries):
+        group_id = str(entry.get(group_key))
+        fields = {k: v for k, v in entry.items() if k not in ("text", "metadata", "deleted")}
+        metadata = json.dumps(entry.get("metadata", {}), ensure_ascii=False)
+        doc_id = documents.setdefault(metadata, len(documents))
+        meta = entry.get("metadata", {})
+        rows.append((
+            vector_id, entry.get("stable_id"), group_id, doc_id, entry.get("text", ""),
+            json.dumps(fields, ensure_ascii=False), float(meta.get("experience_years") or 0.0),
+            entry.get("filename"), meta.get("company"), meta.get("location"),
+            int(bool(entry.get("deleted")))
+        ))
+
+    conn.executemany("INSERT INTO chunks VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    conn.executemany("INSERT INTO documents VALUES (?, ?)", [(i, m) for m, i in documents.items()])
+    conn.execute("CREATE INDEX idx_chunks_group ON chunks(group_id)")
+    conn.executemany("INSERT INTO info VALUES (?, ?)", [
+        ("group_key", group_key), ("count", str(len(rows))), ("version", str(STORE_VERSION))
+    ])
+    conn.commit()
+    conn.close()
+
+    os.replace(tmp_path, path)
+    print(f"Metadata store saved: {path} ({len(rows)} chunks, {len(documents)} documents)")
+
+
+class MetadataStore:
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self.lock = threading.Lock()
+
+        info = dict(self.conn.execute("SELECT name, value FROM info").fetchall())
+        self.group_key = info["group_key"]
+        self.count = int(info["count"])
+        self.version = int(info.get("version", 1))
+
+    def __len__(self):
+        return self.count
+
+    def get_many(self, vector_ids):
+        ids = sorted({int(i) for i in vector_ids if 0 <= int(i) < self.count})
+        if not ids:
+            return {}
+
+        marks = ",".join("?" * len(ids))
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT c.vector_id, c.text, c.fields, d.metadata FROM chunks c "
+                f"JOIN documents d ON d.doc_id = c.doc_id WHERE c.vector_id IN ({marks}) AND c.deleted = 0",
+                ids
+            ).fetchall()
+
+        entries = {}
+        for vector_id, text, fields, metadata in rows:
+            entry = json.loads(fields)
+            entry["text"] = text
+            entry["metadata"] = json.loads(metadata)
+            entries[vector_id] = entry
+        return entries
+
+    def group_ids(self, vector_ids):
+        ids = sorted({int(i) for i in vector_ids if 0 <= int(i) < self.count})
+        if not ids:
+            return {}
+
+        marks = ",".join("?" * len(ids))
+        with self.lock:
+            return dict(self.conn.execute(
+                f"SELECT vector_id, group_id FROM chunks WHERE vector_id IN ({marks}) AND deleted = 0", ids
+            ).fetchall())
+
+    def attributes(self):
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT {', '.join(ATTRIBUTE_COLUMNS)} FROM chunks ORDER BY vector_id"
+            ).fetchall()
+        return {name: [row[i] for row in rows] for i, name in enumerate(ATTRIBUTE_COLUMNS)}
+
+    def all_group_ids(self):
+        with self.lock:
+            return [row[0] for row in self.conn.execute("SELECT group_id FROM chunks ORDER BY vector_id")]
+
+    def first_vectors(self, groups):
+        # {group_id: lowest live vector id of that group}, for groups present in the store
+        groups = list({str(g) for g in groups})
+        if not groups:
+            return {}
+
+        marks = ",".join("?" * len(groups))
+        with self.lock:
+            return dict(self.conn.execute(
+                f"SELECT group_id, MIN(vector_id) FROM chunks WHERE group_id IN ({marks}) AND deleted = 0 "
+                "GROUP BY group_id", groups
+            ).fetchall())
+
+    def __getitem__(self, vector_id):
+        entry = self.get_many([vector_id]).get(int(vector_id))
+        if entry is None:
+            raise IndexError(vector_id)
+        return entry
+
+    def close(self):
+        self.conn.close()
+
+
+def open_store(index_path, json_path, group_key):
+    # Builds the store from the JSON metadata the first time, when the JSON is newer,
+    # or when the store predates the current schema
+    path = store_path(index_path)
+    if os.path.exists(path) and (
+        not os.path.exists(json_path) or os.path.getmtime(json_path) <= os.path.getmtime(path)
+    ):
+        store = MetadataStore(path)
+        if store.version == STORE_VERSION:
+            return store
+        store.close()
+
+    with open(json_path, "r", encoding="utf-8") as f:
+        write_store(path, json.load(f), group_key)
+    return MetadataStore(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build a metadata store from a metadata JSON file")
+    parser.add_argument("json_path")
+    parser.add_argument("index_path", help="FAISS index the metadata belongs to")
+    parser.add_argument("--group-key", default="resume_id", help="resume_id or job_id")
+    args = parser.parse_args()
+
+    with open(args.json_path, "r", encoding="utf-8") as f:
+        write_store(store_path(args.index_path), json.load(f), args.group_key)
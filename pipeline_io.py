@@ -0,0 +1,243 @@
+import os
+import json
+import time
+import argparse
+
+READ_CHUNK = 1 << 16
+FOLLOW_POLL_SECONDS = 0.5
+
+
+def is_jsonl(path):
+    return path.lower().endswith(".jsonl")
+
+
+def done_marker(path):
+    return path + ".done"
+
+
+def _indent(text, prefix="  "):
+    return "\n".join(prefix + line for line in text.split("\n"))
+
+
+def dump_array_item(record):
+    # Same layout json.dump(records, indent=2) produces for one element
+    return _indent(json.dumps(record, indent=2, ensure_ascii=False))
+
+
+def _last_non_space(f, end):
+    pos = end
+    while pos > 0:
+        start = max(0, pos - 4096)
+        f.seek(start)
+        block = f.read(pos - start)
+        stripped = block.rstrip()
+        if stripped:
+            return start + len(stripped) - 1, stripped[-1:]
+        pos = start
+    return -1, b""
+
+
+def _open_json_array_for_append(path):
+    with open(path, "r+b") as f:
+        f.seek(0, 2)
+        close_pos, char = _last_non_space(f, f.tell())
+        if char != b"]":
+            raise ValueError(f"{path} is not a JSON array")
+
+        prev_pos, prev_char = _last_non_space(f, close_pos)
+        f.seek(prev_pos + 1)
+        f.truncate()
+
+    return prev_char != b"["
+
+
+class RecordWriter:
+
+    def __init__(self, path, append=False, atomic=None):
+        self.path = path
+        self.jsonl = is_jsonl(path)
+        self.append = append and os.path.exists(path) and os.path.getsize(path) > 0
+        if atomic is None:
+            # JSONL is written in place so a follower can tail it while it grows
+            atomic = not self.jsonl
+        self.atomic = atomic and not self.append
+        self.target = path + ".tmp" if self.atomic else path
+        self.count = 0
+        self.has_items = False
+
+        if os.path.exists(done_marker(path)):
+            os.remove(done_marker(path))
+
+        if self.jsonl:
+            self.f = open(self.target, "a" if self.append else "w", encoding="utf-8")
+        elif self.append:
+            self.has_items = _open_json_array_for_append(path)
+            self.f = open(self.target, "a", encoding="utf-8")
+        else:
+            self.f = open(self.target, "w", encoding="utf-8")
+            self.f.write("[")
+
+    def write(self, record):
+        if self.jsonl:
+            self.f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self.f.flush()
+        else:
+            self.f.write((",\n" if self.has_items else "\n") + dump_array_item(record))
+            self.has_items = True
+        self.count += 1
+
+    def flush(self):
+        self.f.flush()
+
+    def checkpoint(self):
+        self.f.flush()
+        os.fsync(self.f.fileno())
+
+    def close(self, success=True):
+        if self.f.closed:
+            return
+
+        if not self.jsonl and (success or not self.atomic):
+            self.f.write("\n]" if self.has_items else "]")
+        self.f.close()
+
+        if self.atomic:
+            if success:
+                os.replace(self.target, self.path)
+            else:
+                os.remove(self.target)
+
+        if success and self.jsonl:
+            open(done_marker(self.path), "w").close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(success=exc_type is None)
+        return False
+
+
+def write_records(path, records, atomic=None):
+    with RecordWriter(path, atomic=atomic) as writer:
+        for record in records:
+            writer.write(record)
+    return writer.count
+
+
+def append_records(path, records):
+    with RecordWriter(path, append=True) as writer:
+        for record in records:
+            writer.write(record)
+    return writer.count
+
+
+def iter_json_array(path):
+    decoder = json.JSONDecoder()
+
+    with open(path, "r", encoding="utf-8") as f:
+        buf = ""
+        pos = 0
+        started = False
+        read_size = READ_CHUNK
+        eof = False
+
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+
+            if pos >= len(buf):
+                if eof:
+                    raise ValueError(f"{path}: unexpected end of JSON array")
+                more = f.read(read_size)
+                eof = not more
+                buf = buf[pos:] + more
+                pos = 0
+                continue
+
+            if not started:
+                if buf[pos] != "[":
+                    raise ValueError(f"{path} is not a JSON array")
+                started = True
+                pos += 1
+                continue
+
+            if buf[pos] == "]":
+                return
+
+            try:
+                record, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                more = f.read(read_size)
+                eof = not more
+                buf = buf[pos:] + more
+                pos = 0
+                # grow the read size so one huge record is not re-parsed many times
+                read_size *= 2
+                continue
+
+            read_size = READ_CHUNK
+            yield record
+            pos = end
+
+            if pos > READ_CHUNK:
+                buf = buf[pos:]
+                pos = 0
+
+
+def iter_jsonl(path, follow=False):
+    done = done_marker(path)
+
+    while follow and not os.path.exists(path):
+        time.sleep(FOLLOW_POLL_SECONDS)
+
+    with open(path, "r", encoding="utf-8") as f:
+        partial = ""
+
+        while True:
+            line = f.readline()
+
+            if line.endswith("\n"):
+                line = partial + line
+                partial = ""
+                if line.strip():
+                    yield json.loads(line)
+                continue
+
+            partial += line
+
+            if follow and not os.path.exists(done):
+                time.sleep(FOLLOW_POLL_SECONDS)
+                continue
+
+            # Writer has finished (or we are not following): drain what is left
+            rest = partial + f.read()
+            for tail in rest.split("\n"):
+                if tail.strip():
+                    yield json.loads(tail)
+            return
+
+
+def iter_records(path, follow=False):
+    if is_jsonl(path):
+        return iter_jsonl(path, follow=follow)
+    return iter_json_array(path)
+
+
+def write_json_atomic(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a pipeline stage file between .json and .jsonl")
+    parser.add_argument("source")
+    parser.add_argument("destination")
+    args = parser.parse_args()
+
+    count = write_records(args.destination, iter_records(args.source))
+    print(f"Converted {count} records: {args.source} -> {args.destination}")
@@ -0,0 +1,249 @@
+import os
+import json
+import time
+import argparse
+from collections import defaultdict
+import faiss
+import numpy as np
+import embedding_service
+import faiss_index
+from metadata_store import write_store, store_path
+from skill_index import build_skill_index, index_path
+from bm25_index import build_bm25, resume_docs, RESUME_BM25_DIR, RESUME_TEXT_FILE
+from index_versions import publish
+from Hr_vectorization_ import VALIDATED_JSON, FAISS_INDEX_PATH, METADATA_FILE, DELTA_LOG, resume_entries
+
+# In-place add/remove/replace for the resume index. The index is an IndexIDMap2 over stable
+# chunk ids; metadata rows stay aligned with index rows:
+#   add      new chunks are embedded and appended (index row == metadata vector_id)
+#   remove   rows are tombstoned ("deleted": true); search filters skip them
+#   replace  unchanged chunks keep their row and vector, changed ones are removed + added
+# Every change is appended to the delta log. Compaction drops tombstoned rows from the
+# index and metadata and clears the log; it runs once tombstones pass COMPACT_RATIO.
+COMPACT_RATIO = float(os.getenv("RESUME_COMPACT_RATIO", "0.2"))
+
+
+def _assign_stable_ids(entries):
+    # Metadata written before stable ids existed: derive them the way resume_entries does
+    chunk_no = defaultdict(int)
+    for entry in entries:
+        resume_id = entry.get("resume_id")
+        if "stable_id" not in entry:
+            entry["stable_id"] = faiss_index.stable_id(resume_id, chunk_no[resume_id], entry.get("text", ""))
+        chunk_no[resume_id] += 1
+
+
+def _drop_direct_map(index):
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.make_direct_map(False)
+
+
+def _wrap_with_ids(index, vectors, ids):
+    # Empties a trained index and re-adds the vectors under stable ids
+    index.reset()
+    id_map = faiss.IndexIDMap2(index)
+    id_map.add_with_ids(np.ascontiguousarray(vectors, dtype="float32"), np.asarray(ids, dtype="int64"))
+    return id_map
+
+
+def load_state():
+    index = faiss.read_index(FAISS_INDEX_PATH)
+    with open(METADATA_FILE, "r", encoding="utf-8") as f:
+        entries = json.load(f)
+
+    if len(entries) != index.ntotal:
+        raise RuntimeError(f"{METADATA_FILE} has {len(entries)} entries but {FAISS_INDEX_PATH} "
+                           f"has {index.ntotal} vectors, rebuild with Hr_vectorization_.py")
+
+    if not isinstance(index, faiss.IndexIDMap2):
+        # One-time migration of an index built without ids; no re-embedding
+        vectors = faiss_index.corpus_vectors(index)
+        if vectors is None:
+            raise RuntimeError(f"{FAISS_INDEX_PATH} cannot reconstruct its vectors, "
+                               "rebuild with Hr_vectorization_.py")
+        _drop_direct_map(index)
+        _assign_stable_ids(entries)
+        index = _wrap_with_ids(index, vectors, [e["stable_id"] for e in entries])
+        print(f"Migrated {FAISS_INDEX_PATH} to stable ids ({index.ntotal} vectors)")
+
+    return index, entries
+
+
+def save_state(index, entries):
+    tmp_path = FAISS_INDEX_PATH + ".tmp"
+    faiss.write_index(index, tmp_path)
+    os.replace(tmp_path, FAISS_INDEX_PATH)
+
+    tmp_path = METADATA_FILE + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(entries, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, METADATA_FILE)
+
+    # Written after the JSON so neither is rebuilt from it on the next open
+    write_store(store_path(FAISS_INDEX_PATH), entries, "resume_id")
+    build_skill_index(index_path(FAISS_INDEX_PATH), entries)
+    publish()
+
+
+def log_changes(changes):
+    with open(DELTA_LOG, "a", encoding="utf-8") as f:
+        for change in changes:
+            f.write(json.dumps(dict(change, at=round(time.time(), 3)), ensure_ascii=False) + "\n")
+
+
+def read_log():
+    if not os.path.exists(DELTA_LOG):
+        return []
+    with open(DELTA_LOG, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def tombstone_ratio(entries):
+    return sum(1 for e in entries if e.get("deleted")) / max(len(entries), 1)
+
+
+def apply_changes(records=(), remove_ids=(), compact_ratio=COMPACT_RATIO):
+    # records: validated resume records to add or replace; remove_ids: resume_ids to drop
+    started = time.perf_counter()
+    index, entries = load_state()
+
+    position = {e["stable_id"]: i for i, e in enumerate(entries)}
+    live_rows = defaultdict(list)
+    for i, e in enumerate(entries):
+        if not e.get("deleted"):
+            live_rows[str(e.get("resume_id"))].append(i)
+
+    changes = []
+    added = []
+
+    def tombstone(rows):
+        for row in rows:
+            entries[row] = dict(entries[row], deleted=True)
+        return [entries[row]["stable_id"] for row in rows]
+
+    for resume_id in dict.fromkeys(str(r) for r in remove_ids):
+        rows = live_rows.pop(resume_id, [])
+        if rows:
+            changes.append({"op": "remove", "resume_id": resume_id, "removed": tombstone(rows)})
+
+    # Last record wins when a resume appears twice
+    for r in {str(r.get("resume_id")): r for r in records}.values():
+        resume_id = str(r.get("resume_id"))
+        new_entries = resume_entries(r)
+        new_ids = {e["stable_id"] for e in new_entries}
+
+        removed = tombstone([row for row in live_rows.get(resume_id, [])
+                             if entries[row]["stable_id"] not in new_ids])
+        inserted = []
+        updated = 0
+        for entry in new_entries:
+            row = position.get(entry["stable_id"])
+            if row is None:
+                added.append(entry)
+                inserted.append(entry["stable_id"])
+            elif entries[row] != entry:
+                # Same chunk text: keep the vector, refresh metadata (revives a removed chunk)
+                entries[row] = entry
+                updated += 1
+
+        if removed or inserted or updated:
+            changes.append({"op": "upsert", "resume_id": resume_id, "added": inserted,
+                            "removed": removed, "updated": updated})
+
+    if not changes:
+        print("Resume index already up to date")
+        return []
+
+    if added:
+        vectors = embedding_service.encode([e["text"] for e in added])
+        index.add_with_ids(vectors, np.asarray([e["stable_id"] for e in added], dtype="int64"))
+        entries.extend(added)
+
+    save_state(index, entries)
+    log_changes(changes)
+    print(f"Applied {len(changes)} resume changes: {len(added)} chunks embedded, "
+          f"{sum(len(c['removed']) for c in changes)} removed, {index.ntotal} rows "
+          f"({time.perf_counter() - started:.1f}s)")
+
+    if tombstone_ratio(entries) > compact_ratio:
+        compact()
+    return changes
+
+
+def compact():
+    started = time.perf_counter()
+    index, entries = load_state()
+    dead = np.asarray([e["stable_id"] for e in entries if e.get("deleted")], dtype="int64")
+    live = [e for e in entries if not e.get("deleted")]
+
+    if len(dead):
+        inner = faiss.downcast_index(index.index)
+        if isinstance(inner, faiss.IndexFlat):
+            # Flat storage shifts the remaining rows down, in step with the id map
+            index.remove_ids(dead)
+        else:
+            # IVF keeps its old row numbers after a removal and HNSW cannot remove at all:
+            # re-add the surviving vectors to an emptied copy of the trained index
+            keep = np.flatnonzero([not e.get("deleted") for e in entries])
+            vectors = faiss_index.corpus_vectors(inner)[keep]
+            _drop_direct_map(inner)
+            index = _wrap_with_ids(faiss.clone_index(inner), vectors, [e["stable_id"] for e in live])
+
+    save_state(index, live)
+    if os.path.exists(RESUME_TEXT_FILE):
+        build_bm25(resume_docs(), RESUME_BM25_DIR)
+
+    if os.path.exists(DELTA_LOG):
+        os.remove(DELTA_LOG)
+    print(f"Compacted {FAISS_INDEX_PATH}: dropped {len(dead)} rows, {index.ntotal} remain "
+          f"({time.perf_counter() - started:.1f}s)")
+
+
+def load_records(path=VALIDATED_JSON):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def sync(path=VALIDATED_JSON):
+    # Brings the index in line with the validated records: new and changed resumes are
+    # (re-)embedded, resumes no longer present are removed, the rest cost nothing
+    records = load_records(path)
+    _, entries = load_state()
+    current = {str(e.get("resume_id")) for e in entries if not e.get("deleted")}
+    wanted = {str(r.get("resume_id")) for r in records}
+    return apply_changes(records, sorted(current - wanted))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incremental updates to the resume FAISS index")
+    parser.add_argument("--sync", action="store_true", help=f"apply every difference from {VALIDATED_JSON}")
+    parser.add_argument("--upsert", nargs="+", default=[], metavar="RESUME_ID",
+                        help="add or replace these resumes from the records file")
+    parser.add_argument("--remove", nargs="+", default=[], metavar="RESUME_ID")
+    parser.add_argument("--records", default=VALIDATED_JSON, help="validated resume records (JSON list)")
+    parser.add_argument("--compact", action="store_true", help="drop tombstoned rows now")
+    parser.add_argument("--status", action="store_true")
+    parser.add_argument("--backend", choices=["torch", "onnx"], default=embedding_service.EMBED_BACKEND,
+                        help="embedding backend (default from EMBED_BACKEND)")
+    args = parser.parse_args()
+    embedding_service.set_backend(args.backend)
+
+    if args.sync:
+        sync(args.records)
+
+    if args.upsert or args.remove:
+        wanted = set(args.upsert)
+        records = [r for r in load_records(args.records) if str(r.get("resume_id")) in wanted]
+        missing = wanted - {str(r.get("resume_id")) for r in records}
+        if missing:
+            print(f"Not in {args.records}: {sorted(missing)}")
+        apply_changes(records, args.remove)
+
+    if args.compact:
+        compact()
+
+    if args.status:
+        index, entries = load_state()
+        print(f"{index.ntotal} rows, {tombstone_ratio(entries):.1%} tombstoned, "
+              f"{len(read_log())} logged changes since the last compaction")
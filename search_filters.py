@@ -0,0 +1,96 @@
+import faiss
+import numpy as np
+
+# Attribute predicates evaluated inside the FAISS search through an IDSelectorBitmap, so
+# top-k always means k qualifying vectors. The arrays are built once per metadata store.
+
+
+class VectorFilter:
+
+    def __init__(self, store):
+        attributes = store.attributes()
+        self.count = len(store)
+
+        # Experience sorted once; a minimum/maximum is then two binary searches
+        self.experience = np.asarray(attributes["experience_years"], dtype="float32")
+        self.experience_order = np.argsort(self.experience, kind="stable")
+        self.experience_sorted = self.experience[self.experience_order]
+
+        self.filenames = np.asarray([f or "" for f in attributes["filename"]], dtype=object)
+
+        # Rows tombstoned by an incremental update are never returned
+        self.live = ~np.asarray(attributes["deleted"], dtype=bool)
+
+        # Company/location as category codes: a predicate is matched against the few
+        # distinct values, then expanded with one vectorized isin over the codes
+        self.companies, self.company_codes = self._categories(attributes["company"])
+        self.locations, self.location_codes = self._categories(attributes["location"])
+
+    @staticmethod
+    def _categories(values):
+        labels, codes = np.unique(np.asarray([v or "" for v in values], dtype=object), return_inverse=True)
+        return labels, codes
+
+    def _experience_mask(self, minimum, maximum):
+        lo = np.searchsorted(self.experience_sorted, minimum, side="left") if minimum else 0
+        hi = (np.searchsorted(self.experience_sorted, maximum, side="right")
+              if maximum is not None else self.count)
+        mask = np.zeros(self.count, dtype=bool)
+        mask[self.experience_order[lo:hi]] = True
+        return mask
+
+    @staticmethod
+    def _category_mask(labels, codes, wanted):
+        wanted = [w.strip().lower() for w in wanted if w and w.strip()]
+        matching = [i for i, label in enumerate(labels)
+                    if any(w in label.lower() for w in wanted)]
+        return np.isin(codes, matching)
+
+    def mask(self, min_experience=0.0, max_experience=None, exclude_filenames=None,
+             companies=None, locations=None):
+        mask = self.live.copy()
+
+        if min_experience or max_experience is not None:
+            mask &= self._experience_mask(min_experience, max_experience)
+        if exclude_filenames:
+            mask &= ~np.isin(self.filenames, list(exclude_filenames))
+        if companies:
+            mask &= self._category_mask(self.companies, self.company_codes, companies)
+        if locations:
+            mask &= self._category_mask(self.locations, self.location_codes, locations)
+
+        return mask
+
+
+def is_unfiltered(mask):
+    return mask is None or bool(mask.all())
+
+
+def bitmap_selector(mask):
+    bits = np.packbits(mask, bitorder="little")
+    selector = faiss.IDSelectorBitmap(len(mask), faiss.swig_ptr(bits))
+    # The selector only holds a pointer; keep the bitmap alive alongside it
+    selector.referenced_bits = bits
+    return selector
+
+
+def search_params(index, selector):
+    # Per-call parameters replace the index defaults, so carry nprobe/efSearch over
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        return faiss.SearchParametersIVF(sel=selector, nprobe=ivf.nprobe)
+
+    hnsw_index = faiss.downcast_index(index)
+    if hasattr(hnsw_index, "hnsw"):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=hnsw_index.hnsw.efSearch)
+
+    return faiss.SearchParameters(sel=selector)
+
+
+def filtered_params(index, mask):
+    if is_unfiltered(mask):
+        return None
+    selector = bitmap_selector(mask)
+    params = search_params(index, selector)
+    params.referenced_selector = selector
+    return params
@@ -1,55 +1,65 @@
 import os
 import json
-import faiss
-import torch
-import numpy as np
+import argparse
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import faiss_index
+from faiss_index import grouped_search, GROUP_COMBINE
+from metadata_store import open_store
+from search_filters import VectorFilter, filtered_params
+from bm25_index import load_bm25, fuse_rrf, JOB_BM25_DIR, RRF_DEPTH
+from cross_match import load_cross_match
+from text_cache import file_sha256
 import PyPDF2
 import tkinter as tk
 from tkinter import filedialog
-from transformers import AutoTokenizer, AutoModel
+import embedding_service
+from embedding_service import encode_one
 
 FAISS_INDEX_PATH = "rag_vector_index.faiss"
 METADATA_PATH = "job_description_chunks_metadata.json"
-HF_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+INGEST_MANIFEST = "steps1_manifest.json"
 TOP_K = 5
 
-index = faiss.read_index(FAISS_INDEX_PATH)
-print("FAISS index loaded")
+index = None
+metadata_store = None
+vector_filter = None
+_load_lock = threading.Lock()
 
-with open(METADATA_PATH, "r", encoding="utf-8") as f:
-    metadata_store = json.load(f)
 
-print(f"Loaded {len(metadata_store)} metadata entries")
+def load_index():
+    global index, metadata_store, vector_filter
+    with _load_lock:
+        if index is None:
+            started = time.perf_counter()
+            metadata_store = open_store(FAISS_INDEX_PATH, METADATA_PATH, "job_id")
+            vector_filter = VectorFilter(metadata_store)
+            index = faiss_index.read_index(FAISS_INDEX_PATH)
 
+            print("FAISS index loaded")
+            print(f"Loaded {len(metadata_store)} metadata entries "
+                  f"({time.perf_counter() - started:.2f}s)")
+    return index, metadata_store
 
-tokenizer = AutoTokenizer.from_pretrained(HF_MODEL_NAME)
-model = AutoModel.from_pretrained(HF_MODEL_NAME)
-model.eval()
 
-def mean_pooling(model_output, attention_mask):
-    token_embeddings = model_output.last_hidden_state
-    input_mask_expanded = attention_mask.unsqueeze(-1).expand(token_embeddings.size()).float()
-    return torch.sum(token_embeddings * input_mask_expanded, dim=1) / torch.clamp(
-        input_mask_expanded.sum(dim=1), min=1e-9
-    )
+def _prewarm():
+    try:
+        load_index()
+    except Exception as e:
+        print(f"Prewarm failed, will retry on first search: {e}")
 
-def embed_text(text):
-    encoded_input = tokenizer(
-        text,
-        padding=True,
-        truncation=True,
-        max_length=256,
-        return_tensors="pt"
-    )
-    with torch.no_grad():
-        model_output = model(**encoded_input)
-        embedding = mean_pooling(model_output, encoded_input["attention_mask"])
 
-    vector = embedding.squeeze().numpy().astype("float32")
-    norm = np.linalg.norm(vector)
-    if norm != 0:
-        vector = vector / norm
-    return vector.reshape(1, -1)
+def prewarm():
+    # Index, metadata and model load in the background while the user picks a file
+    embedding_service.prewarm()
+    thread = threading.Thread(target=_prewarm, daemon=True)
+    thread.start()
+    return thread
+
+
+def embed_text(text):
+    return encode_one(text)
 
 
 def extract_text_from_pdf(pdf_path):
@@ -78,14 +88,16 @@ def upload_resume():
 
 
 def search_faiss(vector, top_k=TOP_K):
+    index, metadata_store = load_index()
     scores, indices = index.search(vector, top_k)
     results = []
+    entries = metadata_store.get_many(indices[0])
 
     for idx, score in zip(indices[0], scores[0]):
-        if idx >= len(metadata_store):
+        if idx not in entries:
             continue
 
-        entry = metadata_store[idx]
+        entry = entries[idx]
         results.append({
             "similarity_score": float(score),
             "text": entry.get("text", ""),
@@ -95,7 +107,99 @@ def search_faiss(vector, top_k=TOP_K):
     return results
 
 
-def retrieve_resume_matches():
+def search_jobs(vector, n=TOP_K, combine=GROUP_COMBINE, companies=None, locations=None,
+                query_text=None):
+    # One result per job: chunk hits are grouped by job_id, the best chunk is shown.
+    # Company/location substrings are applied inside the search. With query_text, a BM25
+    # keyword search runs alongside and the two job rankings are fused (RRF).
+    index, metadata_store = load_index()
+    mask = vector_filter.mask(companies=companies, locations=locations)
+    bm25 = load_bm25(JOB_BM25_DIR) if query_text else None
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        keyword = pool.submit(bm25.search, query_text, RRF_DEPTH) if bm25 else None
+        groups = grouped_search(index, vector, max(n, RRF_DEPTH) if keyword else n,
+                                metadata_store.group_ids, combine,
+                                params=filtered_params(index, mask), available=int(mask.sum()))
+        keyword_hits = keyword.result() if keyword else []
+
+    best_chunk = {job_id: (score, chunks) for job_id, score, chunks in groups}
+    order = [job_id for job_id, _, _ in groups[:n]]
+    rrf_scores = {}
+
+    if keyword_hits:
+        # Keyword-only jobs need a stored chunk to display and must pass the same filters
+        first = metadata_store.first_vectors(job_id for job_id, _ in keyword_hits)
+        keyword_jobs = [job_id for job_id, _ in keyword_hits
+                        if job_id in first and mask[first[job_id]]]
+        fused = fuse_rrf([job_id for job_id, _, _ in groups], keyword_jobs)[:n]
+        order = [job_id for job_id, _ in fused]
+        rrf_scores = dict(fused)
+        for job_id in order:
+            if job_id not in best_chunk:
+                best_chunk[job_id] = (0.0, [(first[job_id], 0.0)])
+
+    entries = metadata_store.get_many(best_chunk[job_id][1][0][0] for job_id in order)
+
+    results = []
+    for job_id in order:
+        score, chunks = best_chunk[job_id]
+        entry = entries[chunks[0][0]]
+        result = {
+            "similarity_score": float(score),
+            "job_id": job_id,
+            "matched_chunks": len(chunks),
+            "text": entry.get("text", ""),
+            "metadata": entry.get("metadata", {})
+        }
+        if rrf_scores:
+            result["rrf_score"] = round(rrf_scores[job_id], 5)
+        results.append(result)
+
+    return results
+
+
+def indexed_resume_id(pdf_path):
+    # The corpus resume_id of an uploaded file, only if the ingested file had the same
+    # content; a different resume under a known filename is not a corpus resume
+    name = os.path.basename(pdf_path)
+    if not os.path.exists(INGEST_MANIFEST):
+        return None
+    with open(INGEST_MANIFEST, "r", encoding="utf-8") as f:
+        entry = json.load(f).get(name)
+    if entry and entry.get("sha256") == file_sha256(pdf_path):
+        return name
+    return None
+
+
+def precomputed_jobs(resume_id, n=TOP_K):
+    # Resumes already in the corpus are answered from the offline job x resume tables
+    tables = load_cross_match()
+    hits = tables.best_jobs(resume_id, n) if tables else None
+    if not hits:
+        return None
+
+    _, metadata_store = load_index()
+    first = metadata_store.first_vectors(job_id for job_id, _ in hits)
+    entries = metadata_store.get_many(first.values())
+
+    results = []
+    for job_id, score in hits:
+        if job_id not in first:
+            continue
+        entry = entries[first[job_id]]
+        results.append({
+            "similarity_score": score,
+            "job_id": job_id,
+            "text": entry.get("text", ""),
+            "metadata": entry.get("metadata", {})
+        })
+
+    return results
+
+
+def retrieve_resume_matches(companies=None, locations=None):
+    prewarm()
     print("\nUpload your resume PDF...")
     pdf_path = upload_resume()
 
@@ -105,22 +209,35 @@ def retrieve_resume_matches():
 
     print(f"Resume uploaded: {os.path.basename(pdf_path)}")
 
+    resume_id = None if companies or locations else indexed_resume_id(pdf_path)
+    if resume_id:
+        known = precomputed_jobs(resume_id)
+        if known:
+            print("Known resume, answered from the cross-match table")
+            return known
+
     resume_text = extract_text_from_pdf(pdf_path)
     if not resume_text.strip():
         print("Resume is empty")
         return None
 
     resume_vector = embed_text(resume_text)
-    top_matches = search_faiss(resume_vector)
+    top_matches = search_jobs(resume_vector, companies=companies, locations=locations,
+                              query_text=resume_text)
 
     return top_matches
 
 
 if __name__ == "__main__":
-    matches = retrieve_resume_matches()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--company", action="append", help="only jobs whose company contains this text")
+    parser.add_argument("--location", action="append", help="only jobs whose location contains this text")
+    args = parser.parse_args()
+
+    matches = retrieve_resume_matches(args.company, args.location)
 
     if matches:
-        print("\n===== TOP MATCHED JOB CHUNKS =====\n")
+        print("\n===== TOP MATCHED JOBS =====\n")
         for match in matches:
             md = match.get("metadata", {})
             print(f"Job Title : {md.get('job_title', 'Unknown')}")
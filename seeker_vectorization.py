@@ -1,85 +1,68 @@
 import json
-import numpy as np
+import argparse
 import faiss
-import torch
-from transformers import AutoTokenizer, AutoModel
+import embedding_service
+import faiss_index
+from metadata_store import write_store, store_path
+from bm25_index import build_bm25, JOB_BM25_DIR
 
 PDF_JSON_FILE = "job_description_chunks.json"
 FAISS_INDEX_FILE = "rag_vector_index.faiss"
 METADATA_FILE = "job_description_chunks_metadata.json"
-HF_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
 
 
-with open(PDF_JSON_FILE, "r", encoding="utf-8") as f:
-    pdf_chunks = json.load(f)
+def load_chunks(path=PDF_JSON_FILE):
+    with open(path, "r", encoding="utf-8") as f:
+        pdf_chunks = json.load(f)
 
-print(f"Total chunks loaded: {len(pdf_chunks)}")
+    print(f"Total chunks loaded: {len(pdf_chunks)}")
+    return pdf_chunks
 
-tokenizer = AutoTokenizer.from_pretrained(HF_MODEL_NAME)
-model = AutoModel.from_pretrained(HF_MODEL_NAME)
-model.eval()
 
-def mean_pooling(model_output, attention_mask):
-    token_embeddings = model_output.last_hidden_state
-    input_mask_expanded = attention_mask.unsqueeze(-1).expand(token_embeddings.size()).float()
-    return (
-        torch.sum(token_embeddings * input_mask_expanded, dim=1)
-        / torch.clamp(input_mask_expanded.sum(dim=1), min=1e-9)
-    )
+def build_metadata(pdf_chunks):
+    metadata_store = []
 
-vectors = []
-metadata_store = []
-
-with torch.no_grad():
     for idx, chunk in enumerate(pdf_chunks):
-
-        text = chunk["text"]
-
-        encoded = tokenizer(
-            text,
-            padding=True,
-            truncation=True,
-            max_length=256,
-            return_tensors="pt"
-        )
-
-        model_output = model(**encoded)
-        embedding = mean_pooling(model_output, encoded["attention_mask"])
-        vector = embedding.squeeze().numpy().astype("float32")
-
-        vectors.append(vector)
-
         metadata_store.append({
             "vector_id": idx,
             "job_id": chunk.get("job_id"),
             "chunk_id": chunk.get("chunk_id"),
             "source_file": chunk.get("source_file"),
             "folder": chunk.get("folder"),
-            "text": text,
+            "text": chunk["text"],
             "metadata": chunk.get("metadata", {})
         })
 
-        if (idx + 1) % 50 == 0 or (idx + 1) == len(pdf_chunks):
-            print(f"Embedded {idx + 1}/{len(pdf_chunks)} chunks")
-
-
-vectors = np.array(vectors, dtype="float32")
-faiss.normalize_L2(vectors)
+    return metadata_store
 
-dim = vectors.shape[1]
-index = faiss.IndexFlatIP(dim)
-index.add(vectors)
 
-faiss.write_index(index, FAISS_INDEX_FILE)
-print(f"FAISS index saved: {FAISS_INDEX_FILE}")
+def build_job_index(index_options=None):
+    pdf_chunks = load_chunks()
+    metadata_store = build_metadata(pdf_chunks)
 
-with open(METADATA_FILE, "w", encoding="utf-8") as f:
-    json.dump(metadata_store, f, indent=2, ensure_ascii=False)
+    vectors = embedding_service.encode([chunk["text"] for chunk in pdf_chunks])
+    print(f"Embedded {len(vectors)} chunks")
+    print(embedding_service.summary())
 
-print(f"Metadata saved: {METADATA_FILE}")
+    index = faiss_index.build_index(vectors, **(index_options or {}))
 
+    faiss.write_index(index, FAISS_INDEX_FILE)
+    print(f"FAISS index saved: {FAISS_INDEX_FILE}")
 
+    with open(METADATA_FILE, "w", encoding="utf-8") as f:
+        json.dump(metadata_store, f, indent=2, ensure_ascii=False)
 
+    print(f"Metadata saved: {METADATA_FILE}")
 
+    write_store(store_path(FAISS_INDEX_FILE), metadata_store, "job_id")
+    build_bm25(((chunk.get("job_id"), chunk["text"]) for chunk in pdf_chunks), JOB_BM25_DIR)
 
 
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", choices=["torch", "onnx"], default=embedding_service.EMBED_BACKEND,
+                        help="embedding backend (default from EMBED_BACKEND)")
+    faiss_index.add_index_arguments(parser)
+    args = parser.parse_args()
+    embedding_service.set_backend(args.backend)
+    build_job_index(faiss_index.index_options(args))
@@ -0,0 +1,168 @@
+import os
+import re
+import json
+import argparse
+from collections import Counter, defaultdict, deque
+from pipeline_io import iter_records
+
+GAZETTEER_FILE = "skill_gazetteer.json"
+SOURCE_FILES = ["step3_llm_output.json", "step4_validated.json"]
+MAX_SKILL_TOKENS = 4
+MIN_SINGLE_CHAR_SUPPORT = 3
+
+# Local answers are trusted only when they look as complete as an LLM answer would be
+MIN_LOCAL_SKILLS = 5
+MIN_LOCAL_COVERAGE = 0.6
+
+STOP_SKILLS = {
+    "communication", "communication skills", "teamwork", "team work", "leadership",
+    "problem solving", "time management", "hard working", "management", "skills",
+    "english", "hindi", "tamil", "malayalam", "french", "spanish", "german",
+    "arabic", "urdu"
+}
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9+#.]+")
+
+_matcher = None
+
+
+def tokenize(text):
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        token = token.rstrip(".")
+        if token:
+            tokens.append(token)
+    return tokens
+
+
+def normalize_skill(skill):
+    return " ".join(tokenize(str(skill)))
+
+
+def build_gazetteer(sources=SOURCE_FILES, output_file=GAZETTEER_FILE):
+    # support counts each skill once per resume, however many source files list it
+    pairs = set()
+    spellings = defaultdict(Counter)
+
+    for path in sources:
+        if not os.path.exists(path):
+            continue
+        for r in iter_records(path):
+            seen = set()
+            for skill in r.get("skills", []):
+                norm = normalize_skill(skill)
+                if norm and norm not in seen:
+                    seen.add(norm)
+                    pairs.add((r.get("resume_id"), norm))
+                    spellings[norm][str(skill).strip()] += 1
+
+    counts = Counter(norm for _, norm in pairs)
+    skills = {}
+    for norm, count in counts.items():
+        tokens = norm.split()
+        if norm in STOP_SKILLS or len(tokens) > MAX_SKILL_TOKENS or norm.isdigit():
+            continue
+        if len(norm) < 2 and count < MIN_SINGLE_CHAR_SUPPORT:
+            continue
+        skills[norm] = {
+            "name": spellings[norm].most_common(1)[0][0],
+            "support": count
+        }
+
+    with open(output_file, "w", encoding="utf-8") as f:
+        json.dump({"skills": skills}, f, indent=2, ensure_ascii=False, sort_keys=True)
+
+    print(f"Gazetteer saved: {output_file} ({len(skills)} skills)")
+    return skills
+
+
+class SkillMatcher:
+
+    def __init__(self, skills):
+        self.names = {norm: entry["name"] for norm, entry in skills.items()}
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]
+
+        for norm in self.names:
+            node = 0
+            for token in norm.split():
+                nxt = self.goto[node].get(token)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[node][token] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                node = nxt
+            self.out[node].append((norm, len(norm.split())))
+
+        # Depth-1 nodes fail to the root; deeper nodes are linked breadth-first
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for token, child in self.goto[node].items():
+                queue.append(child)
+                f = self.fail[node]
+                while f and token not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[child] = self.goto[f].get(token, 0)
+                self.out[child] = self.out[child] + self.out[self.fail[child]]
+
+    def find(self, text):
+        spans = []
+        node = 0
+        for i, token in enumerate(tokenize(text)):
+            while node and token not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(token, 0)
+            for norm, length in self.out[node]:
+                spans.append((i - length + 1, i + 1, norm))
+
+        # Drop matches that sit inside a longer one ("learning" in "machine learning")
+        spans.sort(key=lambda s: (s[0], -(s[1] - s[0])))
+        found = {}
+        covered_until = -1
+        for start, end, norm in spans:
+            if end <= covered_until:
+                continue
+            covered_until = max(covered_until, end)
+            found.setdefault(norm, None)
+        return list(found)
+
+    def match(self, text):
+        return [self.names[norm] for norm in self.find(text)]
+
+
+def load_matcher(path=GAZETTEER_FILE):
+    global _matcher
+    if _matcher is None:
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            _matcher = SkillMatcher(json.load(f)["skills"])
+    return _matcher
+
+
+def coverage(skills_text, matcher):
+    parts = [p for p in re.split(r'[|\n•,]', skills_text or "") if p.strip()]
+    if not parts:
+        return 0.0
+    return sum(1 for p in parts if matcher.find(p)) / len(parts)
+
+
+def is_confident(skills, coverage_ratio):
+    return len(skills) >= MIN_LOCAL_SKILLS and coverage_ratio >= MIN_LOCAL_COVERAGE
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--build", action="store_true", help="rebuild the gazetteer from labelled stage outputs")
+    parser.add_argument("--match", help="print the skills found in a piece of text")
+    args = parser.parse_args()
+
+    if args.build or not os.path.exists(GAZETTEER_FILE):
+        build_gazetteer()
+
+    if args.match:
+        print(load_matcher().match(args.match))
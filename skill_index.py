@@ -0,0 +1,198 @@
+import os
+import json
+import argparse
+import numpy as np
+import scipy.sparse as sp
+from skill_gazetteer import tokenize, normalize_skill
+
+# Sparse skill index over the whole resume corpus, built next to the FAISS index.
+#   resume_skill: resumes x distinct skills (binary)
+#   skill_ngram:  distinct skills x token n-grams of each skill (binary)
+# A JD skill matches a resume skill when it equals one of the skill's token n-grams, so
+# JD-to-resume overlap for every resume is two sparse products.
+MAX_NGRAM = 4
+SKILL_WEIGHT = 0.3
+SEMANTIC_WEIGHT = 0.7
+
+
+def index_path(faiss_path):
+    return os.path.splitext(faiss_path)[0] + ".skills.npz"
+
+
+def skill_ngrams(skill):
+    tokens = tokenize(skill)
+    return {
+        " ".join(tokens[i:i + n])
+        for n in range(1, MAX_NGRAM + 1)
+        for i in range(len(tokens) - n + 1)
+    }
+
+
+def _csr_arrays(prefix, matrix):
+    return {
+        f"{prefix}_data": matrix.data, f"{prefix}_indices": matrix.indices,
+        f"{prefix}_indptr": matrix.indptr, f"{prefix}_shape": np.asarray(matrix.shape)
+    }
+
+
+def _csr_from(arrays, prefix):
+    return sp.csr_matrix(
+        (arrays[f"{prefix}_data"], arrays[f"{prefix}_indices"], arrays[f"{prefix}_indptr"]),
+        shape=tuple(arrays[f"{prefix}_shape"])
+    )
+
+
+def build_skill_index(path, entries):
+    # entries: the chunk metadata list written next to the FAISS index, in vector order
+    resume_rows = {}
+    chunk_resume = np.empty(len(entries), dtype="int32")
+    first_chunk, experience, filenames, resume_skills = [], [], [], []
+
+    for vector_id, entry in enumerate(entries):
+        if entry.get("deleted"):
+            # Removed by an incremental update; the row stays until compaction
+            chunk_resume[vector_id] = -1
+            continue
+        resume_id = str(entry.get("resume_id"))
+        row = resume_rows.get(resume_id)
+        if row is None:
+            row = resume_rows[resume_id] = len(resume_rows)
+            meta = entry.get("metadata", {})
+            first_chunk.append(vector_id)
+            experience.append(float(meta.get("experience_years") or 0.0))
+            filenames.append(entry.get("filename") or "")
+            resume_skills.append(list(dict.fromkeys(str(s).lower() for s in meta.get("skills", []))))
+        chunk_resume[vector_id] = row
+
+    skills = {}
+    ngrams = {}
+    rs_rows, rs_cols, sn_rows, sn_cols = [], [], [], []
+    for row, skill_list in enumerate(resume_skills):
+        for skill in skill_list:
+            col = skills.get(skill)
+            if col is None:
+                col = skills[skill] = len(skills)
+                for gram in skill_ngrams(skill):
+                    sn_rows.append(col)
+                    sn_cols.append(ngrams.setdefault(gram, len(ngrams)))
+            rs_rows.append(row)
+            rs_cols.append(col)
+
+    resume_skill = sp.csr_matrix(
+        (np.ones(len(rs_rows), dtype="float32"), (rs_rows, rs_cols)),
+        shape=(len(resume_rows), len(skills))
+    )
+    skill_ngram = sp.csr_matrix(
+        (np.ones(len(sn_rows), dtype="float32"), (sn_rows, sn_cols)),
+        shape=(len(skills), len(ngrams))
+    )
+
+    tmp_path = path + ".tmp.npz"
+    np.savez(
+        tmp_path,
+        resume_ids=np.asarray(list(resume_rows), dtype=str),
+        skills=np.asarray(list(skills), dtype=str),
+        ngrams=np.asarray(list(ngrams), dtype=str),
+        chunk_resume=chunk_resume,
+        first_chunk=np.asarray(first_chunk, dtype="int64"),
+        experience=np.asarray(experience, dtype="float32"),
+        filenames=np.asarray(filenames, dtype=str),
+        **_csr_arrays("resume_skill", resume_skill),
+        **_csr_arrays("skill_ngram", skill_ngram)
+    )
+    os.replace(tmp_path, path)
+    print(f"Skill index saved: {path} ({len(resume_rows)} resumes, {len(skills)} skills, "
+          f"{len(ngrams)} n-grams)")
+
+
+class SkillIndex:
+
+    def __init__(self, path):
+        with np.load(path) as arrays:
+            self.resume_ids = arrays["resume_ids"]
+            self.skills = arrays["skills"]
+            self.chunk_resume = arrays["chunk_resume"]
+            self.first_chunk = arrays["first_chunk"]
+            self.experience = arrays["experience"]
+            self.filenames = arrays["filenames"]
+            self.resume_skill = _csr_from(arrays, "resume_skill")
+            self.skill_ngram = _csr_from(arrays, "skill_ngram")
+            ngrams = arrays["ngrams"]
+
+        self.ngram_ids = {g: i for i, g in enumerate(ngrams.tolist())}
+        self.skill_counts = np.maximum(np.asarray(self.resume_skill.sum(axis=1)).ravel(), 1)
+
+    def __len__(self):
+        return len(self.resume_ids)
+
+    def matched_skill_mask(self, jd_skills):
+        cols = {self.ngram_ids[g] for g in (normalize_skill(s) for s in jd_skills) if g in self.ngram_ids}
+        query = np.zeros(self.skill_ngram.shape[1], dtype="float32")
+        query[list(cols)] = 1.0
+        return (self.skill_ngram @ query) > 0
+
+    def overlap(self, jd_skills):
+        # (matched skill count, matched / total skills) for every resume at once
+        matched = self.matched_skill_mask(jd_skills)
+        counts = self.resume_skill @ matched.astype("float32")
+        return counts, counts / self.skill_counts, matched
+
+    def matched_skills(self, row, matched):
+        start, end = self.resume_skill.indptr[row], self.resume_skill.indptr[row + 1]
+        cols = self.resume_skill.indices[start:end]
+        return [str(self.skills[c]) for c in cols if matched[c]]
+
+    def rank_rows(self, semantic, jd_skills, min_experience=0.0, exclude_filenames=None, n=20,
+                  candidates=None):
+        # Eligible resume rows, best blended score first, with the scores and skill matches.
+        # candidates limits the ranking to those rows (e.g. a semantic search's pool).
+        counts, skill_score, matched = self.overlap(jd_skills)
+
+        eligible = counts > 0
+        if candidates is not None:
+            in_pool = np.zeros(len(self.resume_ids), dtype=bool)
+            in_pool[candidates] = True
+            eligible &= in_pool
+        if min_experience > 0:
+            eligible &= self.experience >= min_experience
+        if exclude_filenames:
+            eligible &= ~np.isin(self.filenames, list(exclude_filenames))
+
+        final = SEMANTIC_WEIGHT * semantic + SKILL_WEIGHT * skill_score
+        final = np.where(eligible, final, -np.inf)
+
+        rows = np.flatnonzero(eligible)
+        if len(rows) > n:
+            rows = rows[np.argpartition(-final[rows], n - 1)[:n]]
+        rows = rows[np.argsort(-final[rows], kind="stable")]
+        return rows, final, matched
+
+    def rank(self, semantic, jd_skills, min_experience=0.0, exclude_filenames=None, n=20):
+        rows, final, matched = self.rank_rows(semantic, jd_skills, min_experience, exclude_filenames, n)
+        return [(int(row), float(final[row]), self.matched_skills(row, matched)) for row in rows]
+
+
+def open_skill_index(faiss_path, json_path):
+    # Built at index time; rebuilt from the metadata JSON if missing or older than it
+    path = index_path(faiss_path)
+    if not os.path.exists(path) or (
+        os.path.exists(json_path) and os.path.getmtime(json_path) > os.path.getmtime(path)
+    ):
+        with open(json_path, "r", encoding="utf-8") as f:
+            build_skill_index(path, json.load(f))
+    return SkillIndex(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the sparse skill index or score a JD skill list")
+    parser.add_argument("--index", default="resume_faiss.index")
+    parser.add_argument("--metadata", default="resume_metadata.json")
+    parser.add_argument("--skills", help="comma-separated JD skills to score against every resume")
+    args = parser.parse_args()
+
+    skill_index = open_skill_index(args.index, args.metadata)
+    if args.skills:
+        jd_skills = [s for s in args.skills.split(",") if s.strip()]
+        ranked = skill_index.rank(np.zeros(len(skill_index), dtype="float32"), jd_skills, n=10)
+        for row, score, matched in ranked:
+            print(f"{skill_index.resume_ids[row]:>12}  {score:.3f}  {matched}")
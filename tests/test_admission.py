@@ -0,0 +1,79 @@
+import asyncio
+import pytest
+from app.services.admission import AdmissionLimiter, Overloaded
+
+
+async def _burst(limiter, count, hold=0.05):
+    async def request():
+        async with limiter:
+            await asyncio.sleep(hold)
+
+    return await asyncio.gather(*(request() for _ in range(count)), return_exceptions=True)
+
+
+def test_burst_sheds_beyond_in_flight_plus_queue():
+    limiter = AdmissionLimiter("t", 1, 1, 5.0, 1)
+    outcomes = asyncio.run(_burst(limiter, 10))
+
+    shed = [o for o in outcomes if isinstance(o, Overloaded)]
+    assert len(shed) == 8
+    assert limiter.stats == {"admitted": 2, "shed_queue_full": 8, "shed_timeout": 0}
+    assert limiter.in_flight == 0 and limiter.waiting == 0
+
+
+def test_queued_request_times_out():
+    limiter = AdmissionLimiter("t", 1, 4, 0.01, 1)
+    outcomes = asyncio.run(_burst(limiter, 3, hold=0.2))
+
+    assert sum(isinstance(o, Overloaded) for o in outcomes) == 2
+    assert limiter.stats["shed_timeout"] == 2
+    assert limiter.in_flight == 0 and limiter.waiting == 0
+
+
+def test_slots_are_reused_after_release():
+    limiter = AdmissionLimiter("t", 2, 0, 1.0, 1)
+
+    async def waves():
+        for _ in range(3):
+            outcomes = await _burst(limiter, 2, hold=0)
+            assert not any(isinstance(o, Exception) for o in outcomes)
+
+    asyncio.run(waves())
+    assert limiter.stats["admitted"] == 6
+
+
+def test_cancelled_waiter_gives_up_its_place():
+    limiter = AdmissionLimiter("t", 1, 1, 5.0, 1)
+
+    async def scenario():
+        await limiter.__aenter__()
+        waiter = asyncio.ensure_future(limiter.__aenter__())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert limiter.waiting == 0
+        await limiter.__aexit__(None, None, None)
+
+    asyncio.run(scenario())
+    assert limiter.in_flight == 0
+
+
+def test_reservation_sheds_before_the_work_ahead_of_the_slot():
+    limiter = AdmissionLimiter("t", 1, 1, 5.0, 1)
+    searches = []
+
+    async def request():
+        async with limiter.reserve() as place:
+            searches.append(1)
+            await asyncio.sleep(0.01)
+            await place.acquire()
+            await asyncio.sleep(0.01)
+
+    async def burst():
+        return await asyncio.gather(*(request() for _ in range(10)), return_exceptions=True)
+
+    outcomes = asyncio.run(burst())
+    assert sum(isinstance(o, Overloaded) for o in outcomes) == 8
+    assert len(searches) == 2
+    assert limiter.in_flight == 0 and limiter.waiting == 0 and limiter.reserved == 0
@@ -0,0 +1,44 @@
+import multiprocessing
+import numpy as np
+from embedding_service import EmbeddingCache, VECTOR_SIZE, text_key
+
+
+def vector_for(key):
+    return np.random.default_rng(int(key[:8], 16)).random(VECTOR_SIZE, dtype="float32")
+
+
+def writer(directory, worker):
+    # Overlapping keys across workers, each added in small batches
+    cache = EmbeddingCache(directory, "model")
+    keys = [text_key(f"text {i}") for i in range(worker * 50, worker * 50 + 200)]
+    for start in range(0, len(keys), 10):
+        batch = keys[start:start + 10]
+        cache.add(batch, [vector_for(k) for k in batch])
+
+
+def test_concurrent_writers_keep_keys_and_vectors_aligned(tmp_path):
+    workers = [multiprocessing.Process(target=writer, args=(str(tmp_path), w)) for w in range(4)]
+    for p in workers:
+        p.start()
+    for p in workers:
+        p.join()
+        assert p.exitcode == 0
+
+    cache = EmbeddingCache(str(tmp_path), "model")
+    keys = [text_key(f"text {i}") for i in range(350)]
+    found = cache.get(keys)
+    assert len(found) == 350 and cache.count == 350
+    for key in keys:
+        np.testing.assert_array_equal(found[key], vector_for(key))
+
+
+def test_interrupted_append_is_truncated(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), "model")
+    keys = [text_key("a"), text_key("b")]
+    cache.add(keys, [vector_for(k) for k in keys])
+    with open(cache.vectors_path, "ab") as f:
+        f.write(b"\0" * 100)
+
+    reopened = EmbeddingCache(str(tmp_path), "model")
+    assert reopened.count == 2
+    np.testing.assert_array_equal(reopened.get(keys)[keys[1]], vector_for(keys[1]))
@@ -0,0 +1,35 @@
+import os
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("onnxruntime")
+pytest.importorskip("transformers")
+
+import embedding_service
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PARITY_CHUNKS = 64
+
+
+@pytest.fixture(scope="module")
+def onnx_dir(tmp_path_factory):
+    # The exported model in ONNX_MODEL_DIR when there is one, otherwise a fresh export
+    existing = embedding_service.ONNX_MODEL_DIR
+    if os.path.exists(os.path.join(existing, embedding_service.ONNX_MODEL_FILE)):
+        return existing
+
+    directory = str(tmp_path_factory.mktemp("onnx_minilm"))
+    try:
+        embedding_service.export_onnx(directory)
+    except OSError as e:
+        pytest.skip(f"{embedding_service.HF_MODEL_NAME} is not available: {e}")
+    return directory
+
+
+def test_onnx_int8_matches_torch(onnx_dir, monkeypatch):
+    # Same gate as python embedding_service.py --parity, on a sample of the stored chunks
+    monkeypatch.setattr(embedding_service, "ONNX_MODEL_DIR", onnx_dir)
+    monkeypatch.setattr(embedding_service, "_models", {})
+    paths = [os.path.join(ROOT, p) for p in embedding_service.PARITY_CORPORA]
+
+    assert embedding_service.parity(PARITY_CHUNKS, paths)
@@ -0,0 +1,27 @@
+import os
+import index_versions
+
+
+def make_files(directory, content):
+    paths = []
+    for name in ("resume_faiss.index", "resume_metadata.json"):
+        path = os.path.join(directory, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        paths.append(path)
+    return paths
+
+
+def test_publish_after_a_failed_publish_left_staging(tmp_path):
+    root = str(tmp_path / "versions")
+    os.makedirs(os.path.join(root, "v123.tmp"))
+    os.makedirs(os.path.join(root, "notes"))
+
+    for i in range(5):
+        version = index_versions.publish(make_files(str(tmp_path), f"index {i}"), root, keep=2)
+
+    assert index_versions.read_manifest(root)["active"] == version
+    index_versions.verify_version(version, root)
+    names = sorted(os.listdir(root))
+    assert "v123.tmp" not in names and "notes" in names
+    assert len([n for n in names if n.startswith("v")]) == 2
@@ -0,0 +1,29 @@
+import pytest
+from pydantic import ValidationError
+from app.models.query_model import QueryRequest, MAX_TOP_K
+
+
+def request(**fields):
+    return QueryRequest(user_type="hr", query="python developer", **fields)
+
+
+def test_defaults():
+    r = request()
+    assert (r.top_k, r.min_experience, r.max_experience) == (5, 0.0, None)
+
+
+@pytest.mark.parametrize("fields", [
+    {"top_k": 0},
+    {"top_k": -3},
+    {"top_k": MAX_TOP_K + 1},
+    {"min_experience": -1},
+    {"min_experience": 5, "max_experience": 2},
+])
+def test_out_of_range_requests_are_rejected(fields):
+    with pytest.raises(ValidationError):
+        request(**fields)
+
+
+def test_bounds_are_accepted():
+    r = request(top_k=MAX_TOP_K, min_experience=3, max_experience=3)
+    assert r.top_k == MAX_TOP_K
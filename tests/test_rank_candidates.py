@@ -0,0 +1,80 @@
+import json
+import faiss
+import numpy as np
+import pytest
+import faiss_index
+import Hr_pdf_reading
+from bm25_index import build_bm25
+from embedding_service import VECTOR_SIZE
+from metadata_store import write_store, store_path
+from skill_index import build_skill_index, index_path
+from Hr_vectorization_ import resume_entries
+
+SKILLS = ["docker", "sql", "react", "aws"]
+
+
+@pytest.fixture
+def hr(tmp_path, monkeypatch):
+    # A small resume corpus (index, metadata store, skill index, BM25) built in tmp_path
+    records = [{
+        "resume_id": f"r{i}.pdf", "filename": f"r{i}.pdf", "file_path": f"/resumes/r{i}.pdf",
+        "skills": ["python", SKILLS[i % len(SKILLS)]], "experience_years": float(i % 5),
+        "total_experience_years": float(i % 5)
+    } for i in range(20)]
+    entries = [e for r in records for e in resume_entries(r)]
+
+    vectors = np.random.default_rng(0).standard_normal((len(entries), VECTOR_SIZE)).astype("float32")
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    index_file = str(tmp_path / "resume_faiss.index")
+    metadata_file = str(tmp_path / "resume_metadata.json")
+    bm25_dir = str(tmp_path / "resume_text.bm25")
+    faiss.write_index(faiss_index.build_index(vectors, "flat", ids=[e["stable_id"] for e in entries]),
+                      index_file)
+    with open(metadata_file, "w", encoding="utf-8") as f:
+        json.dump(entries, f)
+    write_store(store_path(index_file), entries, "resume_id")
+    build_skill_index(index_path(index_file), entries)
+    build_bm25(((e["resume_id"], e["text"]) for e in entries), bm25_dir)
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(Hr_pdf_reading, "FAISS_INDEX_FILE", index_file)
+    monkeypatch.setattr(Hr_pdf_reading, "METADATA_FILE", metadata_file)
+    monkeypatch.setattr(Hr_pdf_reading, "RESUME_BM25_DIR", bm25_dir)
+    for name in ("index", "metadata_store", "vector_filter", "skill_idx"):
+        monkeypatch.setattr(Hr_pdf_reading, name, None)
+    Hr_pdf_reading.load_index()
+    return Hr_pdf_reading, vectors
+
+
+def test_zero_keyword_hits_still_returns_n(hr):
+    # A JD whose words are in no resume: BM25 finds nothing and the dense ranking is cut to n
+    hr, vectors = hr
+    assert not hr.load_bm25(hr.RESUME_BM25_DIR).search("zzzqqqxx", hr.RRF_DEPTH)
+
+    results = hr.rank_candidates(vectors[:1], ["python"], 0, n=5, exclude_hired=False, jd_text="zzzqqqxx")
+    assert len(results) == 5
+    assert all("rrf_score" not in c for c in results)
+
+
+def test_keyword_hits_are_fused_and_cut_to_n(hr):
+    hr, vectors = hr
+    results = hr.rank_candidates(vectors[:1], ["python"], 0, n=5, exclude_hired=False, jd_text="docker")
+    assert len(results) == 5
+    assert all("rrf_score" in c for c in results)
+
+
+def test_experience_filter_applies_to_the_pool(hr):
+    hr, vectors = hr
+    results = hr.rank_candidates(vectors[:1], ["python"], 3, n=20, exclude_hired=False)
+    assert results and all(c["experience_years"] >= 3 for c in results)
+    assert len(results) == 8
+
+
+def test_pool_limits_the_ranking(hr, monkeypatch):
+    hr, vectors = hr
+    monkeypatch.setattr(hr, "CANDIDATE_POOL", 6)
+    results = hr.rank_candidates(vectors[:1], ["python"], 0, n=3, exclude_hired=False)
+    pool = hr.semantic_pool(vectors[:1], 6, exclude_hired=False)
+    assert len(results) == 3
+    assert {c["filename"] for c in results} <= {str(hr.skill_idx.resume_ids[r]) for r in pool}
@@ -0,0 +1,46 @@
+import os
+import hashlib
+
+TEXT_CACHE_DIR = "text_cache"
+
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _cache_path(digest):
+    return os.path.join(TEXT_CACHE_DIR, digest[:2], digest + ".txt")
+
+
+def load_cached_text(digest):
+    path = _cache_path(digest)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def save_cached_text(digest, text):
+    path = _cache_path(digest)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def cached_extract(path, extract):
+    digest = file_sha256(path)
+
+    text = load_cached_text(digest)
+    if text is None:
+        text = extract(path)
+        if text:
+            save_cached_text(digest, text)
+
+    return text, digest